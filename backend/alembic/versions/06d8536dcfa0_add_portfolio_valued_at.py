@@ -0,0 +1,32 @@
+"""Add portfolio valued_at and symbol index for mark-to-market
+
+Revision ID: 06d8536dcfa0
+Revises: e96fa8083290
+Create Date: 2026-10-18 10:12:40.218311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '06d8536dcfa0'
+down_revision: Union[str, Sequence[str], None] = 'e96fa8083290'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The app creates missing tables on startup, so only touch columns/indexes that may be absent
+    op.execute("ALTER TABLE portfolio ADD COLUMN IF NOT EXISTS valued_at TIMESTAMP WITH TIME ZONE")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_portfolio_symbol ON portfolio (symbol)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Mirror image of upgrade: drop exactly the index and column it adds, tolerating either being absent
+    op.execute("DROP INDEX IF EXISTS ix_portfolio_symbol")
+    op.execute("ALTER TABLE portfolio DROP COLUMN IF EXISTS valued_at")
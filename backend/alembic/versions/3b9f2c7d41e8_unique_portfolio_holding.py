@@ -0,0 +1,48 @@
+"""Merge duplicate holdings and make (user_id, symbol) unique
+
+Revision ID: 3b9f2c7d41e8
+Revises: 06d8536dcfa0
+Create Date: 2026-10-18 11:03:12.771902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9f2c7d41e8'
+down_revision: Union[str, Sequence[str], None] = '06d8536dcfa0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Racing trades could create two rows for one holding, fold them into the oldest row first
+    op.execute("""
+        WITH merged AS (
+            SELECT user_id, symbol, MIN(id) AS keep_id, SUM(quantity) AS quantity,
+                   SUM(avg_price * quantity) / NULLIF(SUM(quantity), 0) AS avg_price
+            FROM portfolio
+            GROUP BY user_id, symbol
+            HAVING COUNT(*) > 1
+        )
+        UPDATE portfolio p
+        SET quantity = m.quantity, avg_price = COALESCE(m.avg_price, p.avg_price)
+        FROM merged m
+        WHERE p.id = m.keep_id
+    """)
+    op.execute("""
+        DELETE FROM portfolio p
+        USING portfolio q
+        WHERE p.user_id = q.user_id AND p.symbol = q.symbol AND p.id > q.id
+    """)
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_portfolio_user_symbol ON portfolio (user_id, symbol)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Merged duplicate holdings stay merged
+    op.execute("DROP INDEX IF EXISTS uq_portfolio_user_symbol")
@@ -0,0 +1,65 @@
+"""Add leaderboard period return columns and indexes
+
+Revision ID: 5d2e9b1f7c3a
+Revises: 8c41d0e5a7f2
+Create Date: 2026-10-18 15:02:41.318527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e9b1f7c3a'
+down_revision: Union[str, Sequence[str], None] = '8c41d0e5a7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PERIODS = ("day", "week", "month")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # leaderboard and portfolio_snapshots were only ever made by create_all; create them here too
+    # so a database migrated before the app first starts reaches head
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            user_id INTEGER NOT NULL PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+            username VARCHAR,
+            portfolio_value FLOAT NOT NULL,
+            total_pnl FLOAT NOT NULL,
+            total_pnl_percentage FLOAT NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_leaderboard_portfolio_value "
+        "ON leaderboard (portfolio_value DESC, user_id)"
+    )
+    for period in PERIODS:
+        op.execute(f"ALTER TABLE leaderboard ADD COLUMN IF NOT EXISTS {period}_return DOUBLE PRECISION")
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_leaderboard_{period}_return "
+            f"ON leaderboard ({period}_return DESC NULLS LAST, user_id)"
+        )
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS portfolio_snapshots (
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            snapshot_date DATE NOT NULL,
+            cash FLOAT NOT NULL,
+            market_value FLOAT NOT NULL,
+            total_value FLOAT NOT NULL,
+            total_pnl FLOAT NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            PRIMARY KEY (user_id, snapshot_date)
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The leaderboard is derived data, rebuilt from holdings on startup
+    op.execute("DROP TABLE IF EXISTS portfolio_snapshots")
+    op.execute("DROP TABLE IF EXISTS leaderboard")
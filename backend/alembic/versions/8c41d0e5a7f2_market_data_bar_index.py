@@ -0,0 +1,42 @@
+"""Add market_data interval and unique (symbol, interval, date) index
+
+Revision ID: 8c41d0e5a7f2
+Revises: 3b9f2c7d41e8
+Create Date: 2026-10-18 12:20:05.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d0e5a7f2'
+down_revision: Union[str, Sequence[str], None] = '3b9f2c7d41e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE market_data ADD COLUMN IF NOT EXISTS interval VARCHAR NOT NULL DEFAULT '1d'")
+    op.execute("ALTER TABLE market_data ALTER COLUMN volume TYPE BIGINT")
+    # Keep the newest copy of any duplicated bar before enforcing uniqueness
+    op.execute("""
+        DELETE FROM market_data a
+        USING market_data b
+        WHERE a.symbol = b.symbol AND a.interval = b.interval AND a.date = b.date AND a.id < b.id
+    """)
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_market_data_symbol_interval_date "
+        "ON market_data (symbol, interval, date)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Mirror image of upgrade; the deleted duplicate bars are not restored
+    op.execute("DROP INDEX IF EXISTS uq_market_data_symbol_interval_date")
+    op.execute("ALTER TABLE market_data ALTER COLUMN volume TYPE INTEGER")
+    op.execute("ALTER TABLE market_data DROP COLUMN IF EXISTS interval")
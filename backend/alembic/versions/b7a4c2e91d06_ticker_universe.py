@@ -0,0 +1,53 @@
+"""Add ticker_universe with trigram and full-text indexes
+
+Revision ID: b7a4c2e91d06
+Revises: 5d2e9b1f7c3a
+Create Date: 2026-10-18 16:11:27.904215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7a4c2e91d06'
+down_revision: Union[str, Sequence[str], None] = '5d2e9b1f7c3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS ticker_universe (
+            symbol VARCHAR PRIMARY KEY,
+            name VARCHAR NOT NULL DEFAULT '',
+            exchange VARCHAR,
+            name_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', coalesce(name, ''))) STORED,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_ticker_universe_name_tsv ON ticker_universe USING gin (name_tsv)")
+
+    # Servers without the contrib package still migrate; the app then searches in memory
+    available = op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    ).scalar()
+    if available:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_ticker_universe_symbol_trgm "
+            "ON ticker_universe USING gin (symbol gin_trgm_ops)"
+        )
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_ticker_universe_name_trgm "
+            "ON ticker_universe USING gin (name gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # pg_trgm stays installed: other schemas in the database may use it
+    op.execute("DROP TABLE IF EXISTS ticker_universe")
@@ -0,0 +1,57 @@
+"""Create orders and market_insights for databases migrated before first start
+
+Revision ID: c3f8a61e2b94
+Revises: b7a4c2e91d06
+Create Date: 2026-10-18 22:40:12.517306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a61e2b94'
+down_revision: Union[str, Sequence[str], None] = 'b7a4c2e91d06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Same definitions create_all uses, so either path leaves an identical schema
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users (id),
+            symbol VARCHAR,
+            side VARCHAR,
+            order_type VARCHAR,
+            quantity INTEGER,
+            trigger_price FLOAT,
+            status VARCHAR,
+            transaction_id INTEGER REFERENCES transactions (id),
+            error VARCHAR,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            triggered_at TIMESTAMP WITH TIME ZONE
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_id ON orders (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_user_id ON orders (user_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_orders_status_symbol ON orders (status, symbol)")
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS market_insights (
+            window_start TIMESTAMP WITH TIME ZONE NOT NULL PRIMARY KEY,
+            status VARCHAR NOT NULL,
+            insights JSON,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            updated_at TIMESTAMP WITH TIME ZONE
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS market_insights")
+    op.execute("DROP TABLE IF EXISTS orders")
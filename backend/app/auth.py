@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from . import models, schemas
 from .database import get_db
+from .services.leaderboard_service import leaderboard_service
 import os
 from dotenv import load_dotenv
 
@@ -84,4 +85,6 @@ async def create_user(db: AsyncSession, user: schemas.UserCreate):
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    
+    await leaderboard_service.refresh_users(db, [db_user.id])
     return db_user
\ No newline at end of file
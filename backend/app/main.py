@@ -1,12 +1,26 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine
+from .database import engine, AsyncSessionLocal
 from . import models
-from .routers import auth, users, stocks, trades, market, leaderboard, ai
+from .routers import auth, users, stocks, trades, orders, market, leaderboard, ai
+from .services.price_refresher import price_refresher
+from .services.blocking import gateways
+from .services.leaderboard_service import leaderboard_service
+from .services import portfolio_service
+from .services.order_engine import order_engine
+from .services.history_service import history_service
+from .services.indicator_engine import indicator_engine
+from .services.risk_service import risk_service
+from .services.snapshot_service import snapshot_service
+from .services.symbol_search import symbol_search
+from .services.ticker_universe import ticker_universe
+from .services.insights_service import insights_service
 
 async def create_tables():
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+        if ticker_universe.search_backend == "database":
+            await ticker_universe.ensure_search_indexes(conn)
 
 app = FastAPI(
     title="Investment Trading API",
@@ -28,6 +42,7 @@ app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(stocks.router)
 app.include_router(trades.router)
+app.include_router(orders.router)
 app.include_router(market.router)
 app.include_router(leaderboard.router)
 app.include_router(ai.router)
@@ -35,6 +50,35 @@ app.include_router(ai.router)
 @app.on_event("startup")
 async def startup_event():
     await create_tables()
+    async with AsyncSessionLocal() as db:
+        await leaderboard_service.rebuild(db)
+    # Order matters: holdings are marked to market before the leaderboard aggregates them
+    price_refresher.add_listener(portfolio_service.on_prices_changed)
+    price_refresher.add_listener(leaderboard_service.on_prices_changed)
+    price_refresher.add_listener(order_engine.on_prices_changed)
+    price_refresher.start()
+    order_engine.start()
+    history_service.add_listener(indicator_engine.on_bars)
+    history_service.add_listener(risk_service.on_bars)
+    history_service.start()
+    snapshot_service.start()
+    insights_service.start()
+    if ticker_universe.search_backend == "memory":
+        symbol_search.start()
+    else:
+        ticker_universe.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await price_refresher.stop()
+    await order_engine.stop()
+    await history_service.stop()
+    await snapshot_service.stop()
+    await insights_service.stop()
+    await symbol_search.stop()
+    await ticker_universe.stop()
+    for gateway in gateways:
+        gateway.shutdown()
 
 @app.get("/")
 async def read_root():
@@ -44,6 +88,10 @@ async def read_root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/upstreams")
+async def upstream_health():
+    return [gateway.stats() for gateway in gateways]
+
 
 
 @app.options("/{full_path:path}")
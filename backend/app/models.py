@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Computed, Integer, BigInteger, String, Float, Date, DateTime, Boolean, ForeignKey, Text, Index, JSON
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -37,14 +38,21 @@ class Portfolio(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    symbol = Column(String)
+    symbol = Column(String, index=True)
     quantity = Column(Integer)
     avg_price = Column(Float)
     current_price = Column(Float)
+    # When current_price was last marked to market
+    valued_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
     
     user = relationship("User", back_populates="portfolio")
+    
+    __table_args__ = (
+        # One row per holding, lets trades upsert with ON CONFLICT (user_id, symbol)
+        Index("uq_portfolio_user_symbol", "user_id", "symbol", unique=True),
+    )
 
 class Transaction(Base):
     __tablename__ = "transactions"
@@ -60,17 +68,45 @@ class Transaction(Base):
     
     user = relationship("User", back_populates="transactions")
 
+class Order(Base):
+    __tablename__ = "orders"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    symbol = Column(String)
+    side = Column(String)
+    order_type = Column(String)
+    quantity = Column(Integer)
+    trigger_price = Column(Float)
+    # open -> triggered -> filled | rejected, or open -> cancelled
+    status = Column(String, default="open")
+    transaction_id = Column(Integer, ForeignKey("transactions.id"))
+    error = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    triggered_at = Column(DateTime(timezone=True))
+    
+    __table_args__ = (
+        Index("ix_orders_status_symbol", "status", "symbol"),
+    )
+
 class MarketData(Base):
     __tablename__ = "market_data"
     
     id = Column(Integer, primary_key=True, index=True)
     symbol = Column(String)
+    # Bar size in yfinance notation: 1d for daily bars, 1h/5m/... for intraday
+    interval = Column(String, default="1d", server_default="1d", nullable=False)
     date = Column(DateTime(timezone=True))
     open_price = Column(Float)
     high_price = Column(Float)
     low_price = Column(Float)
     close_price = Column(Float)
-    volume = Column(Integer)
+    volume = Column(BigInteger)
+    
+    __table_args__ = (
+        # Idempotent upserts and range scans for one symbol's series
+        Index("uq_market_data_symbol_interval_date", "symbol", "interval", "date", unique=True),
+    )
     
 class AIExplanation(Base):
     __tablename__ = "ai_explanations"
@@ -78,4 +114,63 @@ class AIExplanation(Base):
     id = Column(Integer, primary_key=True, index=True)
     term = Column(String, unique=True, index=True)
     explanation = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class LeaderboardEntry(Base):
+    __tablename__ = "leaderboard"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    username = Column(String)
+    portfolio_value = Column(Float, default=0.0, nullable=False)
+    total_pnl = Column(Float, default=0.0, nullable=False)
+    total_pnl_percentage = Column(Float, default=0.0, nullable=False)
+    # Total value change (%) between the latest snapshot and the one at the start of each period
+    day_return = Column(Float)
+    week_return = Column(Float)
+    month_return = Column(Float)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Top-N reads walk these indexes instead of sorting every user
+        Index("ix_leaderboard_portfolio_value", portfolio_value.desc(), user_id),
+        Index("ix_leaderboard_day_return", day_return.desc().nullslast(), user_id),
+        Index("ix_leaderboard_week_return", week_return.desc().nullslast(), user_id),
+        Index("ix_leaderboard_month_return", month_return.desc().nullslast(), user_id),
+    )
+
+class PortfolioSnapshot(Base):
+    __tablename__ = "portfolio_snapshots"
+    
+    # The primary key doubles as the index for "latest snapshot on or before a date" per user
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    snapshot_date = Column(Date, primary_key=True)
+    cash = Column(Float, nullable=False)
+    market_value = Column(Float, nullable=False)
+    total_value = Column(Float, nullable=False)
+    total_pnl = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TickerUniverse(Base):
+    __tablename__ = "ticker_universe"
+    
+    symbol = Column(String, primary_key=True)
+    name = Column(String, nullable=False, default="")
+    exchange = Column(String)
+    name_tsv = Column(TSVECTOR, Computed("to_tsvector('simple', coalesce(name, ''))", persisted=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # The gin_trgm_ops indexes need pg_trgm, so they live in migration b7a4c2e91d06 and
+        # ticker_universe.ensure_search_indexes rather than in create_all
+        Index("ix_ticker_universe_name_tsv", "name_tsv", postgresql_using="gin"),
+    )
+
+class MarketInsightWindow(Base):
+    __tablename__ = "market_insights"
+    
+    # One row per generation window; inserting it is how a worker claims the window's LLM call
+    window_start = Column(DateTime(timezone=True), primary_key=True)
+    status = Column(String, nullable=False, default="pending")
+    insights = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True))
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from typing import List
 from .. import schemas, models
 from ..database import get_db
 from ..auth import get_current_user
 from ..services.ai_service import ai_service
+from ..services.insights_service import insights_service
+from ..services.llm_scheduler import llm_scheduler
+from ..services.portfolio_service import get_holdings
+from ..services.risk_service import risk_service
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
@@ -20,29 +23,28 @@ async def explain_term(
         "explanation": explanation
     }
 
+@router.get("/explain/cache/stats")
+async def get_explanation_cache_stats():
+    return ai_service.explanation_stats()
+
+@router.get("/scheduler/stats")
+async def get_llm_scheduler_stats():
+    return llm_scheduler.stats()
+
 @router.get("/insights", response_model=List[schemas.MarketInsight])
-async def get_market_insights():
-    insights = ai_service.get_market_insights()
-    return insights
+async def get_market_insights(db: AsyncSession = Depends(get_db)):
+    # Generated in the background once per window; a memory read once this worker has polled
+    return await insights_service.get(db)
 
 @router.get("/portfolio-analysis", response_model=schemas.PortfolioAnalysis)
 async def analyze_portfolio(
     current_user: models.User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(models.Portfolio).filter(models.Portfolio.user_id == current_user.id))
-    portfolio = result.scalars().all()
-    
-    portfolio_data = []
-    for holding in portfolio:
-        portfolio_data.append({
-            "symbol": holding.symbol,
-            "quantity": holding.quantity,
-            "avg_price": holding.avg_price,
-            "current_price": holding.current_price
-        })
+    portfolio_data = await get_holdings(db, current_user.id)
+    risk = await risk_service.analyze(portfolio_data) if portfolio_data else None
     
-    analysis = ai_service.analyze_portfolio(portfolio_data)
+    analysis = ai_service.analyze_portfolio(portfolio_data, risk)
     return analysis
 
 
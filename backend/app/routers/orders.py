@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Optional
+from .. import schemas, models
+from ..database import get_db
+from ..auth import get_current_user
+from ..services.order_engine import order_engine
+from ..services.trade_engine import TradeError
+
+router = APIRouter(prefix="/api/orders", tags=["orders"])
+
+@router.post("/", response_model=schemas.Order)
+async def place_order(
+    order: schemas.OrderCreate,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        return await order_engine.place(db, current_user.id, order.model_dump())
+    except TradeError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@router.get("/", response_model=List[schemas.Order])
+async def get_orders(
+    status: Optional[str] = None,
+    limit: int = 50,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    query = select(models.Order).filter(models.Order.user_id == current_user.id)
+    if status:
+        query = query.filter(models.Order.status == status)
+    result = await db.execute(query.order_by(models.Order.created_at.desc()).limit(limit))
+    return result.scalars().all()
+
+@router.delete("/{order_id}")
+async def cancel_order(
+    order_id: int,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not await order_engine.cancel(db, current_user.id, order_id):
+        raise HTTPException(status_code=404, detail="Open order not found")
+    return {"message": "Order cancelled"}
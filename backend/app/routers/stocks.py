@@ -1,45 +1,166 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 from .. import schemas, models
-from ..database import get_db
+from ..database import get_db, AsyncSessionLocal
 from ..services.stock_service import stock_service
+from ..services.price_refresher import price_refresher
+from ..services.history_service import history_service
+from ..services.market_data import period_to_timedelta
+from ..services.chart_service import chart_service, CHART_RANGES, CHART_STYLES
+from ..services.indicator_engine import indicator_engine
+from ..services.symbol_search import symbol_search
+from ..services.ticker_universe import ticker_universe
 
 router = APIRouter(prefix="/api/stocks", tags=["stocks"])
 
+def _set_freshness_header(response: Response, stocks):
+    # Prices come from the background refresher, tell clients how old they are
+    timestamps = [stock.updated_at for stock in stocks if stock.updated_at]
+    if timestamps:
+        response.headers["X-Prices-As-Of"] = min(timestamps).isoformat()
+
 @router.get("/", response_model=List[schemas.Stock])
-async def get_stocks(db: AsyncSession = Depends(get_db)):
-    await stock_service.update_stock_prices(db)
-    
+async def get_stocks(response: Response, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(models.Stock))
     stocks = result.scalars().all()
+    _set_freshness_header(response, stocks)
     return stocks
 
-@router.get("/{symbol}", response_model=schemas.Stock)
-async def get_stock(symbol: str, db: AsyncSession = Depends(get_db)):
-    await stock_service.update_stock_prices(db, [symbol.upper()])
+@router.get("/quote-cache/stats")
+async def get_quote_cache_stats():
+    return stock_service.quote_cache.stats()
+
+@router.get("/search")
+async def search_stocks(q: str, limit: int = 10, db: AsyncSession = Depends(get_db)):
+    # Matching and ranking run against an index (trigram/full-text or in-memory); only the hits are looked up
+    limit = min(limit, 50)
+    if ticker_universe.search_backend == "memory":
+        matches = symbol_search.search(q, limit=limit)
+    else:
+        matches = await ticker_universe.search(db, q, limit=limit)
+    if not matches:
+        return []
+    result = await db.execute(select(models.Stock).filter(
+        models.Stock.symbol.in_([match["symbol"] for match in matches])
+    ))
+    stocks = {stock.symbol: stock for stock in result.scalars().all()}
+    return [
+        schemas.Stock.model_validate(stocks[match["symbol"]]).model_dump() if match["symbol"] in stocks else {
+            "symbol": match["symbol"],
+            "name": match["name"],
+            "exchange": match.get("exchange"),
+            "current_price": None
+        }
+        for match in matches
+    ]
+
+@router.get("/screener")
+async def screen_stocks(
+    rsi_min: Optional[float] = None,
+    rsi_max: Optional[float] = None,
+    above_sma: Optional[bool] = None,
+    macd_bullish: Optional[bool] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(select(models.Stock.symbol))
+    rows = await indicator_engine.universe(list(result.scalars().all()))
     
-    result = await db.execute(select(models.Stock).filter(models.Stock.symbol == symbol.upper()))
-    stock = result.scalar_one_or_none()
-    if not stock:
-        raise HTTPException(status_code=404, detail="Stock not found")
+    def matches(row):
+        if rsi_min is not None and (row["rsi"] is None or row["rsi"] < rsi_min):
+            return False
+        if rsi_max is not None and (row["rsi"] is None or row["rsi"] > rsi_max):
+            return False
+        if above_sma is not None and (row["sma"] is None or (row["close"] > row["sma"]) != above_sma):
+            return False
+        if macd_bullish is not None and (row["macd_histogram"] is None or (row["macd_histogram"] > 0) != macd_bullish):
+            return False
+        return True
     
-    return stock
-
+    return [row for row in rows if matches(row)][:limit]
 
+@router.get("/{symbol}", response_model=schemas.Stock)
+async def get_stock(symbol: str, response: Response):
+    symbol = symbol.upper()
+    # Served from the quote cache or the stocks row; only never-seen symbols are fetched inline
+    quote = await price_refresher.get_quote(symbol)
+    if quote is None:
+        raise HTTPException(status_code=404, detail="Stock not found")
+    price_refresher.track([symbol])
+    
+    if quote["updated_at"]:
+        response.headers["X-Prices-As-Of"] = quote["updated_at"].isoformat()
+    return quote
 
-@router.get("/search")
-async def search_stocks(q: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.Stock).filter(
-        models.Stock.symbol.ilike(f"%{q}%") | 
-        models.Stock.name.ilike(f"%{q}%")
-    ).limit(10))
-    db_stocks = result.scalars().all()
+@router.get("/{symbol}/history")
+async def get_stock_history(
+    symbol: str,
+    period: str = "1mo",
+    interval: str = "1d",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    symbol = symbol.upper()
+    if start is None:
+        try:
+            window = period_to_timedelta(period)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if window is not None:
+            start = datetime.now(timezone.utc) - window
+    query = history_service.range_query(symbol, interval, start, end)
     
-    if db_stocks:
-        return db_stocks
+    async def stream_bars():
+        # Own session: the rows are streamed after the request dependencies have finished
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query.execution_options(yield_per=1000))
+            yield "["
+            first = True
+            async for bar in result:
+                item = json.dumps({
+                    "date": bar.date.isoformat(),
+                    "open": bar.open_price,
+                    "high": bar.high_price,
+                    "low": bar.low_price,
+                    "close": bar.close_price,
+                    "volume": bar.volume
+                })
+                yield item if first else "," + item
+                first = False
+            yield "]"
+    
+    return StreamingResponse(stream_bars(), media_type="application/json")
+
+@router.get("/{symbol}/chart")
+async def get_stock_chart(
+    symbol: str,
+    range: str = "1Y",
+    style: str = "candle",
+    max_points: Optional[int] = None,
+    resolution: Optional[str] = None
+):
+    range_key = range.upper()
+    if range_key not in CHART_RANGES:
+        raise HTTPException(status_code=400, detail=f"range must be one of {', '.join(CHART_RANGES)}")
+    if style not in CHART_STYLES:
+        raise HTTPException(status_code=400, detail=f"style must be one of {', '.join(CHART_STYLES)}")
+    if max_points is not None and max_points < 3:
+        raise HTTPException(status_code=400, detail="max_points must be at least 3")
     
-    external_results = stock_service.search_stocks(q)
-    return external_results
+    try:
+        return await chart_service.get_chart(symbol.upper(), range_key, style, max_points, resolution)
+    except ValueError as e:
+        # Resolution not whitelisted or finer than the stored bars
+        raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/{symbol}/indicators")
+async def get_stock_indicators(symbol: str, db: AsyncSession = Depends(get_db)):
+    indicators = await indicator_engine.get(db, symbol.upper())
+    if indicators is None:
+        raise HTTPException(status_code=404, detail="No price history for this symbol")
+    return indicators
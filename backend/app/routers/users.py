@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select
-from typing import List
+from sqlalchemy import select
+from typing import List, Optional
+from datetime import date
+import pandas as pd
 from .. import schemas, models
 from ..database import get_db
 from ..auth import get_current_user
+from ..services.leaderboard_service import leaderboard_service
+from ..services.portfolio_service import get_holdings
+from ..services.equity_service import equity_service
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
@@ -40,30 +45,23 @@ async def update_user_profile(
     
     await db.commit()
     await db.refresh(current_user)
+    
+    if user_update.username:
+        await leaderboard_service.refresh_users(db, [current_user.id])
     return current_user
 
-@router.get("/me/portfolio", response_model=List[schemas.Portfolio])
+@router.get("/me/portfolio", response_model=List[schemas.PortfolioHolding])
 async def get_user_portfolio(
     current_user: models.User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(models.Portfolio).filter(models.Portfolio.user_id == current_user.id))
-    portfolio = result.scalars().all()
-    
-    portfolio_symbols = list(set([holding.symbol for holding in portfolio]))
-    
-    if portfolio_symbols:
-        from ..services.stock_service import stock_service
-        await stock_service.update_stock_prices(db, portfolio_symbols)
+    holdings = await get_holdings(db, current_user.id)
     
-    for holding in portfolio:
-        stock_result = await db.execute(select(models.Stock).filter(models.Stock.symbol == holding.symbol))
-        stock = stock_result.scalar_one_or_none()
-        if stock:
-            holding.current_price = stock.current_price
+    if holdings:
+        from ..services.price_refresher import price_refresher
+        price_refresher.track({holding["symbol"] for holding in holdings})
     
-    await db.commit()
-    return portfolio
+    return holdings
 
 @router.get("/me/transactions", response_model=List[schemas.Transaction])
 async def get_user_transactions(
@@ -78,41 +76,24 @@ async def get_user_transactions(
     
     return transactions
 
+@router.get("/me/equity-curve")
+async def get_user_equity_curve(
+    start: Optional[date] = None,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Daily cash, market value and total value replayed from the user's transactions
+    return await equity_service.get_curve(db, current_user.id, pd.Timestamp(start) if start else None)
+
 @router.get("/me/rank", response_model=schemas.UserRank)
 async def get_user_rank(
     current_user: models.User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    # Calculate portfolio values for all users
-    user_portfolios_query = select(
-        models.User.id,
-        func.coalesce(func.sum(models.Portfolio.current_price * models.Portfolio.quantity), 0).label('portfolio_value')
-    ).select_from(
-        models.User.__table__.outerjoin(models.Portfolio.__table__)
-    ).group_by(models.User.id)
-    
-    user_portfolios_result = await db.execute(user_portfolios_query)
-    user_portfolios = user_portfolios_result.all()
-    
-    # Sort by portfolio value to get rankings
-    sorted_portfolios = sorted(user_portfolios, key=lambda x: x.portfolio_value or 0, reverse=True)
-    
-    total_users = len(sorted_portfolios)
-    user_rank = None
+    standing = await leaderboard_service.rank_of(db, current_user.id)
+    if standing is None:
+        # Not materialized yet (e.g. created before the leaderboard existed)
+        await leaderboard_service.refresh_users(db, [current_user.id])
+        standing = await leaderboard_service.rank_of(db, current_user.id)
     
-    for i, portfolio in enumerate(sorted_portfolios):
-        if portfolio.id == current_user.id:
-            user_rank = i + 1
-            break
-    
-    if not user_rank:
-        return {"rank": total_users, "total_users": total_users, "percentile": 0}
-    
-    percentile = ((total_users - user_rank + 1) / total_users) * 100
-    
-    return {
-        "rank": user_rank,
-        "total_users": total_users,
-        "percentile": percentile
-    }
-
+    return standing
\ No newline at end of file
@@ -70,6 +70,12 @@ class Portfolio(PortfolioBase):
     class Config:
         from_attributes = True
 
+class PortfolioHolding(Portfolio):
+    valued_at: Optional[datetime] = None
+    market_value: float
+    total_pnl: float
+    total_pnl_percentage: float
+
 # Transaction schemas
 class TransactionBase(BaseModel):
     symbol: str
@@ -89,9 +95,53 @@ class Transaction(TransactionBase):
     class Config:
         from_attributes = True
 
+class BatchTradeRequest(BaseModel):
+    orders: List[TransactionCreate]
+    # "all_or_nothing" rolls back the whole batch if any order is rejected, "best_effort" skips it
+    mode: str = "all_or_nothing"
+
+class BatchOrderResult(BaseModel):
+    index: int
+    symbol: str
+    type: str
+    quantity: int
+    status: str
+    price: Optional[float] = None
+    total: Optional[float] = None
+    transaction_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchTradeResponse(BaseModel):
+    mode: str
+    executed: int
+    rejected: int
+    balance: float
+    results: List[BatchOrderResult]
+
+# Resting order schemas
+class OrderCreate(BaseModel):
+    symbol: str
+    side: str
+    order_type: str
+    quantity: int
+    trigger_price: float
+
+class Order(OrderCreate):
+    id: int
+    user_id: int
+    status: str
+    transaction_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    triggered_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 # Market data schemas
 class MarketDataBase(BaseModel):
     symbol: str
+    interval: str = "1d"
     date: datetime
     open_price: float
     high_price: float
@@ -112,6 +162,7 @@ class LeaderboardEntry(BaseModel):
     portfolio_value: float
     total_pnl: float
     total_pnl_percentage: float
+    period_return: Optional[float] = None
     rank: int
 
 # AI schemas
@@ -152,4 +203,9 @@ class PortfolioAnalysis(BaseModel):
     total_pnl_percentage: float
     risk_score: float
     diversification_score: float
-    recommendations: List[str]
\ No newline at end of file
+    recommendations: List[str]
+    # Only present when the holdings have enough daily price history
+    volatility: Optional[float] = None
+    beta: Optional[float] = None
+    var_95_historical: Optional[float] = None
+    var_95_parametric: Optional[float] = None
\ No newline at end of file
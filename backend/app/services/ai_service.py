@@ -1,17 +1,34 @@
 import google.generativeai as genai
-from typing import List
+import json
+from typing import List, Optional
 import os
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from .. import models
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .. import models, schemas
+from ..database import AsyncSessionLocal
+from .llm_scheduler import BACKGROUND, INTERACTIVE, FakeModel, LLMSchedulerError, is_quota_error, llm_scheduler
+from .cache import AsyncTTLCache
+from .glossary import glossary
 
 load_dotenv()
 
+class ExplanationUnavailable(Exception):
+    """Generation failed; carries the text to show the user meanwhile"""
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
 class AIService:
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
-        if api_key:
+        if os.getenv("LLM_BACKEND", "gemini") == "fake":
+            # Local fake model for load-testing the scheduler without network or quota
+            self.model = FakeModel.from_env()
+            self.enabled = True
+            print("AI service using the fake model backend")
+        elif api_key:
             genai.configure(api_key=api_key)
             # Use the most efficient model for free tier
             self.model = genai.GenerativeModel('gemini-flash-latest')
@@ -21,103 +38,163 @@ class AIService:
             self.model = None
             self.enabled = False
             print("Warning: GEMINI_API_KEY not set. AI features will return mock responses.")
+        if self.model is not None:
+            llm_scheduler.configure(self.model.generate_content)
+        
+        self.explanations = AsyncTTLCache(
+            "ai-explanations",
+            ttl_seconds=float(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", 86400)),
+            max_entries=int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", 5000))
+        )
+        self.failed_explanations = AsyncTTLCache(
+            "ai-explanation-failures",
+            ttl_seconds=float(os.getenv("EXPLANATION_NEGATIVE_TTL_SECONDS", 60)),
+            max_entries=1000
+        )
+        self.explain_requests = 0
+        self.llm_calls = 0
     
     async def explain_term(self, term: str, db: AsyncSession) -> str:
-        """Explain a financial term using AI"""
-        # Check if explanation already exists
-        result = await db.execute(select(models.AIExplanation).filter(models.AIExplanation.term == term.lower()))
-        existing = result.scalar_one_or_none()
-        if existing:
-            return existing.explanation
+        """Explain a financial term using AI
+
+        Lookups go memory LRU -> ai_explanations table -> Gemini. Concurrent
+        requests for the same term share one load, and terms whose generation
+        failed are answered from a short-lived negative cache instead of
+        calling Gemini again straight away.
+        """
+        # Variants ("P/E", "pe ratio", "price to earnings") share one cache key
+        resolution = glossary.resolve(term)
+        key = resolution.key or term.strip().lower()
+        self.explain_requests += 1
+        explanation = self.explanations.get(key)
+        if explanation is not None:
+            return explanation
+        
+        failed = self.failed_explanations.get(key)
+        if failed is not None:
+            return failed
+        
+        try:
+            # Own session in the loader: coalesced callers outlive whichever request started it
+            return await self.explanations.get_or_load(key, lambda: self._load_explanation(term, key, resolution.canonical))
+        except ExplanationUnavailable as e:
+            self.failed_explanations.set(key, e.message)
+            return e.message
+    
+    async def _load_explanation(self, term: str, key: str, canonical: Optional[str]) -> str:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(models.AIExplanation.explanation).filter(models.AIExplanation.term == key))
+            existing = result.scalar_one_or_none()
+        if existing is not None:
+            return existing
         
         if not self.enabled:
-            # Return a mock explanation when Gemini API is not available
-            explanation = f"{term} is an important financial concept. This is a placeholder explanation since Gemini API is not configured. Please set your GEMINI_API_KEY environment variable to get detailed AI explanations."
-            
-            # Save mock explanation to database
-            db_explanation = models.AIExplanation(term=term.lower(), explanation=explanation)
-            db.add(db_explanation)
-            await db.commit()
-            
-            return explanation
+            # Mock explanations are only kept in memory, so a real one is generated once a key is set
+            return glossary.explanation(canonical) or f"{term} is an important financial concept. This is a placeholder explanation since Gemini API is not configured. Please set your GEMINI_API_KEY environment variable to get detailed AI explanations."
         
+        # No connection is held while the request waits in the scheduler queue
         try:
             prompt = f"You are a financial education assistant. Explain the financial term '{term}' in simple, easy-to-understand language for beginners. Keep it to 2-3 sentences."
             
-            response = self.model.generate_content(prompt)
+            response = await llm_scheduler.submit(prompt, priority=INTERACTIVE)
+            self.llm_calls += 1
             explanation = response.text.strip()
-            
-            # Save explanation to database
-            db_explanation = models.AIExplanation(term=term.lower(), explanation=explanation)
-            db.add(db_explanation)
-            await db.commit()
-            
-            return explanation
+        except LLMSchedulerError as e:
+            # Shed, over budget or circuit open: the model was never called
+            print(f"Explanation for '{term}' not generated: {e}")
+            raise ExplanationUnavailable(self._get_fallback_explanation(term, canonical))
         except Exception as e:
-            error_str = str(e)
+            self.llm_calls += 1
             print(f"Gemini API error: {e}")
             
-            # Handle quota exceeded errors specifically
-            if "quota" in error_str.lower() or "429" in error_str:
-                fallback_explanation = self._get_fallback_explanation(term)
-                
-                # Save fallback explanation to database
-                db_explanation = models.AIExplanation(term=term.lower(), explanation=fallback_explanation)
-                db.add(db_explanation)
-                await db.commit()
-                
-                return fallback_explanation
-            
-            return f"Sorry, I couldn't explain '{term}' at the moment. Please try again later."
+            if is_quota_error(e):
+                raise ExplanationUnavailable(self._get_fallback_explanation(term, canonical))
+            raise ExplanationUnavailable(f"Sorry, I couldn't explain '{term}' at the moment. Please try again later.")
+        
+        # Upsert: another worker may have stored the same term in the meantime
+        async with AsyncSessionLocal() as db:
+            stmt = pg_insert(models.AIExplanation.__table__).values(term=key, explanation=explanation)
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=["term"],
+                set_={"explanation": stmt.excluded.explanation}
+            ))
+            await db.commit()
+        return explanation
     
-    def _get_fallback_explanation(self, term: str) -> str:
+    def _get_fallback_explanation(self, term: str, canonical: Optional[str] = None) -> str:
         """Provide fallback explanations for common financial terms when AI is unavailable"""
-        fallback_explanations = {
-            "stock": "A stock represents ownership in a company. When you buy stock, you become a shareholder and own a piece of that business.",
-            "dividend": "A dividend is a payment made by companies to their shareholders, usually from profits. It's like getting a bonus for owning the stock.",
-            "p/e ratio": "The Price-to-Earnings ratio compares a company's stock price to its earnings per share. It helps investors determine if a stock is expensive or cheap.",
-            "market cap": "Market capitalization is the total value of a company's shares. It's calculated by multiplying the stock price by the number of shares outstanding.",
-            "bull market": "A bull market is a period when stock prices are rising and investor confidence is high. It's called 'bull' because bulls attack upward.",
-            "bear market": "A bear market is a period when stock prices are falling by 20% or more. It's called 'bear' because bears attack downward.",
-            "volatility": "Volatility measures how much a stock's price moves up and down. High volatility means the price changes a lot, low volatility means it's more stable.",
-            "portfolio": "A portfolio is your collection of investments like stocks, bonds, and other assets. Diversifying your portfolio helps reduce risk.",
-            "eps": "Earnings Per Share (EPS) is a company's profit divided by the number of shares. It shows how much money the company makes for each share.",
-            "roe": "Return on Equity (ROE) measures how efficiently a company uses shareholders' money to generate profits. Higher ROE is generally better.",
-            "liquidity": "Liquidity refers to how easily you can buy or sell an investment without affecting its price. Cash is the most liquid asset.",
-            "diversification": "Diversification means spreading your investments across different types of assets to reduce risk. Don't put all your eggs in one basket.",
-            "day trading": "Day trading involves buying and selling stocks within the same trading day. It's risky and requires significant time and knowledge.",
-            "buy and hold": "Buy and hold is a long-term investment strategy where you purchase stocks and keep them for years, regardless of market fluctuations."
-        }
-        
-        term_lower = term.lower()
-        if term_lower in fallback_explanations:
-            return fallback_explanations[term_lower]
+        explanation = glossary.explanation(canonical)
+        if explanation:
+            return explanation
         
         return f"{term} is an important financial concept. Due to high demand, detailed AI explanations are temporarily limited. Please try again later or search for this term online for more information."
     
-    def get_market_insights(self) -> List[dict]:
-        """Generate market insights using AI or fallback data"""
-        if not self.enabled:
-            return self._get_fallback_insights()
+    def explanation_stats(self) -> dict:
+        """How much normalization and caching save: every request not answered by Gemini is an avoided call"""
+        return {
+            "requests": self.explain_requests,
+            "llm_calls": self.llm_calls,
+            "avoided_llm_calls": self.explain_requests - self.llm_calls,
+            "avoided_ratio": round(1 - self.llm_calls / self.explain_requests, 4) if self.explain_requests else 0.0,
+            "normalization": glossary.stats(),
+            "caches": [self.explanations.stats(), self.failed_explanations.stats()]
+        }
+    
+    async def generate_market_insights(self, market: dict) -> List[dict]:
+        """Generate market insights grounded in the current stocks table (see insights_service)"""
+        if not self.enabled or not market.get("movers"):
+            return self.grounded_insights(market) or self._get_fallback_insights()
         
         try:
-            prompt = """As a financial market analyst, provide 3 brief market insights for today. 
-            For each insight, provide:
-            1. A clear title (max 4 words)
-            2. Content (2-3 sentences explaining the insight)
-            3. Sentiment (positive, negative, or neutral)
-            4. Confidence score (0.0 to 1.0)
-            
-            Focus on general market trends, sector performance, or economic indicators."""
-            
-            response = self.model.generate_content(prompt)
+            prompt = f"""As a financial market analyst, provide 3 brief market insights for today based only on this market data:
+            {json.dumps(market, default=str)}
             
-            # Parse AI response or return structured fallback
-            return self._parse_ai_insights(response.text) if response.text else self._get_fallback_insights()
+            Respond with a JSON array only, no prose and no code fences. Each element must be an object with:
+            "title": a clear title (max 4 words),
+            "content": 2-3 sentences explaining the insight, citing the symbols or sectors involved,
+            "sentiment": one of "positive", "negative" or "neutral",
+            "confidence": a number from 0.0 to 1.0"""
             
+            response = await llm_scheduler.submit(prompt, priority=BACKGROUND)
+            return self._parse_ai_insights(response.text)
         except Exception as e:
             print(f"Gemini API error in market insights: {e}")
-            return self._get_fallback_insights()
+            return self.grounded_insights(market) or self._get_fallback_insights()
+    
+    def grounded_insights(self, market: dict) -> List[dict]:
+        """Rule-based insights from the same market data, used when the model is unavailable"""
+        insights = []
+        gainers = [m for m in market.get("movers", []) if m["change_percent"] > 0]
+        losers = [m for m in market.get("movers", []) if m["change_percent"] < 0]
+        if gainers:
+            top = gainers[0]
+            insights.append({
+                "title": f"{top['symbol']} Leads Gains",
+                "content": f"{top['name']} ({top['symbol']}) is the top gainer, up {top['change_percent']:.2f}%. "
+                           f"Other strong names: {', '.join(m['symbol'] for m in gainers[1:3]) or 'none'}.",
+                "sentiment": "positive",
+                "confidence": 0.9
+            })
+        if losers:
+            worst = losers[-1]
+            insights.append({
+                "title": f"{worst['symbol']} Under Pressure",
+                "content": f"{worst['name']} ({worst['symbol']}) is the weakest performer, down {abs(worst['change_percent']):.2f}%.",
+                "sentiment": "negative",
+                "confidence": 0.9
+            })
+        sectors = market.get("sectors", [])
+        if sectors:
+            best, worst = sectors[0], sectors[-1]
+            insights.append({
+                "title": "Sector Rotation",
+                "content": f"{best['sector']} leads with an average move of {best['avg_change_percent']:.2f}%, "
+                           f"while {worst['sector']} trails at {worst['avg_change_percent']:.2f}%. "
+                           f"{market.get('advancers', 0)} stocks are up and {market.get('decliners', 0)} down.",
+                "sentiment": "positive" if best["avg_change_percent"] > 0 > worst["avg_change_percent"] else "neutral",
+                "confidence": 0.85
+            })
+        return insights[:3]
     
     def _get_fallback_insights(self) -> List[dict]:
         """Provide fallback market insights when AI is unavailable"""
@@ -161,12 +238,32 @@ class AIService:
         return selected_insights
     
     def _parse_ai_insights(self, ai_text: str) -> List[dict]:
-        """Parse AI response into structured insights"""
-        # Fallback to structured insights if parsing fails
-        return self._get_fallback_insights()
+        """Parse the model's JSON answer into validated MarketInsight dicts, raising ValueError if unusable"""
+        text = (ai_text or "").strip()
+        start, end = text.find("["), text.rfind("]")
+        if start == -1 or end <= start:
+            raise ValueError("No JSON array in model response")
+        
+        insights = []
+        for item in json.loads(text[start:end + 1]):
+            insight = schemas.MarketInsight.model_validate(item)
+            sentiment = insight.sentiment.lower()
+            insights.append({
+                "title": insight.title,
+                "content": insight.content,
+                "sentiment": sentiment if sentiment in ("positive", "negative", "neutral") else "neutral",
+                "confidence": min(max(insight.confidence, 0.0), 1.0)
+            })
+        if not insights:
+            raise ValueError("Model returned no insights")
+        return insights[:3]
     
-    def analyze_portfolio(self, portfolio_data: List[dict]) -> dict:
-        """Analyze user's portfolio and provide recommendations"""
+    def analyze_portfolio(self, portfolio_data: List[dict], risk: Optional[dict] = None) -> dict:
+        """Analyze user's portfolio and provide recommendations
+
+        `risk` comes from risk_service; without enough price history the scores
+        fall back to the holding-count heuristic.
+        """
         try:
             if not portfolio_data:
                 return {
@@ -184,28 +281,22 @@ class AIService:
             total_invested = total_value - total_pnl
             total_pnl_percentage = (total_pnl / total_invested * 100) if total_invested > 0 else 0
             
-            # Calculate diversification score (0-1)
             num_holdings = len(portfolio_data)
-            diversification_score = min(num_holdings / 10, 1.0)
-            
-            # Calculate risk score based on portfolio concentration
-            if num_holdings == 0:
-                risk_score = 0
-            elif num_holdings == 1:
-                risk_score = 0.9
-            elif num_holdings <= 3:
-                risk_score = 0.7
-            elif num_holdings <= 5:
-                risk_score = 0.5
+            if risk:
+                diversification_score = risk["diversification_score"]
+                risk_score = risk["risk_score"]
             else:
-                risk_score = 0.3
+                diversification_score, risk_score = self._holding_count_scores(num_holdings)
             
             # Generate recommendations
             recommendations = self._generate_recommendations(
                 num_holdings, diversification_score, risk_score, total_pnl_percentage
             )
+            if risk and risk["beta"] > 1.3:
+                recommendations.insert(0, "Your portfolio moves more than the market - add lower-beta holdings to soften swings")
+                recommendations = recommendations[:4]
             
-            return {
+            analysis = {
                 "total_value": round(total_value, 2),
                 "total_pnl": round(total_pnl, 2),
                 "total_pnl_percentage": round(total_pnl_percentage, 2),
@@ -213,6 +304,16 @@ class AIService:
                 "diversification_score": round(diversification_score, 2),
                 "recommendations": recommendations
             }
+            if risk:
+                # VaR is a fraction of the holdings that have price history
+                covered_value = total_value * risk["coverage"]
+                analysis.update({
+                    "volatility": round(risk["volatility"], 4),
+                    "beta": round(risk["beta"], 2),
+                    "var_95_historical": round(risk["var_95_historical"] * covered_value, 2),
+                    "var_95_parametric": round(risk["var_95_parametric"] * covered_value, 2)
+                })
+            return analysis
             
         except Exception as e:
             print(f"Error in portfolio analysis: {e}")
@@ -225,6 +326,21 @@ class AIService:
                 "recommendations": ["Portfolio analysis temporarily unavailable"]
             }
     
+    def _holding_count_scores(self, num_holdings: int):
+        """Diversification and risk scores (0-1) from the number of holdings alone"""
+        diversification_score = min(num_holdings / 10, 1.0)
+        if num_holdings == 0:
+            risk_score = 0
+        elif num_holdings == 1:
+            risk_score = 0.9
+        elif num_holdings <= 3:
+            risk_score = 0.7
+        elif num_holdings <= 5:
+            risk_score = 0.5
+        else:
+            risk_score = 0.3
+        return diversification_score, risk_score
+    
     def _generate_recommendations(self, num_holdings: int, diversification_score: float, 
                                 risk_score: float, pnl_percentage: float) -> List[str]:
         """Generate personalized portfolio recommendations"""
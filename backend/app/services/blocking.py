@@ -0,0 +1,109 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class UpstreamTimeoutError(Exception):
+    pass
+
+
+class BlockingGateway:
+    """Runs blocking calls to one upstream dependency off the event loop
+
+    Each dependency gets its own thread pool and concurrency limit, so a slow
+    upstream can only tie up its own threads and never stalls other requests.
+    A slot is held until the worker thread actually finishes, so timed-out calls
+    still count against the limit instead of piling up behind it.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=name)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore()
+        started = time.monotonic()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise UpstreamTimeoutError(f"{self.name}: no free slot within {timeout}s")
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        self.calls += 1
+
+        def release(_):
+            self.active -= 1
+            semaphore.release()
+
+        future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(release, f))
+
+        remaining = max(timeout - (time.monotonic() - started), 0)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), remaining)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise UpstreamTimeoutError(f"{self.name}: call exceeded {timeout}s")
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.total_seconds += time.monotonic() - started
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+            "active": self.active,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_seconds": round(self.total_seconds / self.calls, 4) if self.calls else 0.0
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+market_data_gateway = BlockingGateway(
+    "market-data",
+    max_concurrency=int(os.getenv("MARKET_DATA_MAX_CONCURRENCY", 4)),
+    timeout=float(os.getenv("MARKET_DATA_TIMEOUT_SECONDS", 20))
+)
+
+gemini_gateway = BlockingGateway(
+    "gemini",
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", 4)),
+    timeout=float(os.getenv("GEMINI_TIMEOUT_SECONDS", 30))
+)
+
+gateways = [market_data_gateway, gemini_gateway]
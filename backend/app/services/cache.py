@@ -0,0 +1,125 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class AsyncTTLCache:
+    """In-process TTL + LRU cache with single-flight loading
+
+    Concurrent get_or_load calls for the same missing key share one loader call
+    instead of each going upstream.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int = 1024):
+        self.name = name
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.load_errors = 0
+        # Bumped by invalidate/clear so loads started before them don't store stale results
+        self.generation = 0
+        self.stale_loads = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+        # A load already running for key finishes for its waiters; later callers start a fresh one
+        self._inflight.pop(key, None)
+        self.generation += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._inflight.clear()
+        self.generation += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          ttl: Optional[float] = None) -> Any:
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            inflight = asyncio.ensure_future(self._load(key, loader, ttl, self.generation))
+            # Retrieve the exception even if every caller has stopped waiting
+            inflight.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self._inflight[key] = inflight
+        # The load is its own task and every caller, the first included, waits through shield:
+        # a cancelled request (client disconnect) stops waiting without failing the others
+        return await asyncio.shield(inflight)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float],
+                    generation: int) -> Any:
+        try:
+            value = await loader()
+        except Exception:
+            self.load_errors += 1
+            raise
+        else:
+            # The waiters still get the value, but it was built from data invalidated since
+            if self.generation == generation:
+                self.set(key, value, ttl)
+            else:
+                self.stale_loads += 1
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "load_errors": self.load_errors,
+            "stale_loads": self.stale_loads,
+            "generation": self.generation,
+            "in_flight": len(self._inflight),
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
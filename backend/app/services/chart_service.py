@@ -0,0 +1,172 @@
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import AsyncSessionLocal
+from .cache import AsyncTTLCache
+from .history_service import history_service
+
+load_dotenv()
+
+# Zoom level -> (preferred bar size, lookback); falls back to daily bars if that size is not ingested
+CHART_RANGES = {
+    "1D": ("5m", timedelta(days=1)),
+    "1W": ("1h", timedelta(days=7)),
+    "1M": ("1d", timedelta(days=31)),
+    "3M": ("1d", timedelta(days=92)),
+    "1Y": ("1d", timedelta(days=366)),
+    "5Y": ("1d", timedelta(days=5 * 366)),
+    "MAX": ("1d", None)
+}
+CHART_STYLES = ("candle", "line")
+
+# Accepted ?resolution= values -> (pandas resample rule, bucket width); anything else would let a
+# client ask for millions of empty buckets
+CHART_RESOLUTIONS = {
+    "1h": ("1h", timedelta(hours=1)),
+    "1D": ("1D", timedelta(days=1)),
+    "1W": ("1W", timedelta(weeks=1)),
+    "1M": ("MS", timedelta(days=28)),
+}
+_INTERVAL = re.compile(r"^(\d+)(m|h|d|wk|mo)$")
+_INTERVAL_UNITS = {"m": timedelta(minutes=1), "h": timedelta(hours=1), "d": timedelta(days=1),
+                   "wk": timedelta(weeks=1), "mo": timedelta(days=28)}
+
+
+def interval_width(interval: str) -> timedelta:
+    """Bar width of a yfinance interval such as 5m, 1h, 1d or 1wk"""
+    match = _INTERVAL.match(interval)
+    if not match:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return int(match.group(1)) * _INTERVAL_UNITS[match.group(2)]
+
+
+def bucket_ohlc(bars: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """Merge consecutive bars into at most max_points candles, keeping true open/high/low/close"""
+    n = len(bars)
+    if n <= max_points:
+        return bars
+    starts = np.unique(np.arange(max_points) * n // max_points)
+    ends = np.append(starts[1:], n) - 1
+    return pd.DataFrame({
+        "open": bars["open"].to_numpy()[starts],
+        "high": np.maximum.reduceat(bars["high"].to_numpy(), starts),
+        "low": np.minimum.reduceat(bars["low"].to_numpy(), starts),
+        "close": bars["close"].to_numpy()[ends],
+        "volume": np.add.reduceat(bars["volume"].to_numpy(), starts)
+    }, index=bars.index[starts])
+
+
+def resample_ohlc(bars: pd.DataFrame, resolution: str) -> pd.DataFrame:
+    """Re-aggregate bars onto a calendar resolution such as 1h, 1D or 1W"""
+    return bars.resample(resolution).agg({
+        "open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"
+    }).dropna(subset=["close"])
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets downsampling, returns the indices of the points to keep"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        bx, by = x[start:end], y[start:end]
+        areas = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        keep[i + 1] = a
+    return keep
+
+
+class ChartService:
+    """Chart-ready candles and lines over market_data, downsampled server-side and cached"""
+
+    def __init__(self):
+        self.default_max_points = int(os.getenv("CHART_MAX_POINTS", 500))
+        self.cache = AsyncTTLCache(
+            "charts",
+            ttl_seconds=float(os.getenv("CHART_CACHE_TTL_SECONDS", 300)),
+            max_entries=int(os.getenv("CHART_CACHE_MAX_ENTRIES", 512))
+        )
+
+    def interval_for(self, range_key: str) -> str:
+        interval, _ = CHART_RANGES[range_key]
+        return interval if interval in history_service.intervals else "1d"
+
+    def check_resolution(self, range_key: str, resolution: str):
+        """Only whitelisted resolutions at least as coarse as the bars the range is served from"""
+        if resolution not in CHART_RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(CHART_RESOLUTIONS)}")
+        interval = self.interval_for(range_key)
+        if CHART_RESOLUTIONS[resolution][1] < interval_width(interval):
+            raise ValueError(f"resolution {resolution} is finer than the {interval} bars stored for {range_key}")
+
+    async def load_bars(self, db: AsyncSession, symbol: str, interval: str,
+                        start: Optional[datetime] = None) -> pd.DataFrame:
+        result = await db.execute(history_service.range_query(symbol, interval, start))
+        bars = pd.DataFrame(result.all(), columns=["date", "open", "high", "low", "close", "volume"])
+        return bars.set_index(pd.DatetimeIndex(bars.pop("date")))
+
+    async def get_chart(self, symbol: str, range_key: str = "1Y", style: str = "candle",
+                        max_points: Optional[int] = None, resolution: Optional[str] = None) -> dict:
+        max_points = max_points or self.default_max_points
+        if resolution:
+            self.check_resolution(range_key, resolution)
+        key = (symbol, range_key, style, max_points, resolution)
+        return await self.cache.get_or_load(
+            key, lambda: self._build(symbol, range_key, style, max_points, resolution)
+        )
+
+    async def _build(self, symbol: str, range_key: str, style: str,
+                     max_points: int, resolution: Optional[str]) -> dict:
+        interval = self.interval_for(range_key)
+        _, lookback = CHART_RANGES[range_key]
+        start = datetime.now(timezone.utc) - lookback if lookback else None
+        # Waiters on the same key share this load, so it can't borrow any one request's session
+        async with AsyncSessionLocal() as db:
+            bars = await self.load_bars(db, symbol, interval, start)
+
+        if resolution:
+            bars = resample_ohlc(bars, CHART_RESOLUTIONS[resolution][0])
+
+        if style == "line":
+            x = bars.index.asi8.astype(np.float64)
+            y = bars["close"].to_numpy(dtype=np.float64)
+            picked = bars.iloc[lttb(x, y, max_points)]
+            points = [
+                {"date": date.isoformat(), "close": close}
+                for date, close in zip(picked.index, picked["close"].tolist())
+            ]
+        else:
+            picked = bucket_ohlc(bars, max_points)
+            points = [
+                {"date": date.isoformat(), "open": o, "high": h, "low": l, "close": c, "volume": int(v)}
+                for date, o, h, l, c, v in zip(
+                    picked.index, picked["open"].tolist(), picked["high"].tolist(),
+                    picked["low"].tolist(), picked["close"].tolist(), picked["volume"].tolist()
+                )
+            ]
+
+        return {
+            "symbol": symbol,
+            "range": range_key,
+            "interval": interval,
+            "style": style,
+            "source_points": len(bars),
+            "points": points
+        }
+
+chart_service = ChartService()
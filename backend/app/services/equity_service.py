@@ -0,0 +1,183 @@
+import os
+from typing import Dict, List, Optional
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from ..database import AsyncSessionLocal
+from .cache import AsyncTTLCache
+
+load_dotenv()
+
+market_data = models.MarketData.__table__
+transactions = models.Transaction.__table__
+users = models.User.__table__
+
+class EquityCurve:
+    """A user's replayed equity curve plus what is needed to extend it
+
+    Rows before `open_date` are final. The `open_date` row can still change
+    (a new bar for that day, or more trades on it), so extending restarts from
+    there using `positions`/`cash` as they stood entering that day and the
+    transactions already seen on or after it.
+    """
+
+    def __init__(self, cash: float):
+        self.rows = pd.DataFrame(columns=["cash", "market_value", "value"], index=pd.DatetimeIndex([]))
+        self.open_date: Optional[pd.Timestamp] = None
+        self.positions: Dict[str, float] = {}
+        self.cash = cash
+        self.pending = pd.DataFrame(columns=["id", "day", "symbol", "quantity", "cash_delta"])
+        self.last_transaction_id = 0
+
+
+def _to_day(values) -> pd.Series:
+    return pd.to_datetime(pd.Series(values), utc=True).dt.tz_convert(None).dt.normalize()
+
+
+def replay(closes: pd.DataFrame, flows: pd.DataFrame, positions: Dict[str, float], cash: float,
+           start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """Vectorized replay: cumulative signed quantity per symbol times the (day x symbol) close matrix
+
+    `flows` has one row per transaction with day, symbol, signed quantity and cash delta.
+    `closes` may hold rows before `start` (each symbol's last close before it); they are
+    forward-filled into days without a bar of their own and then dropped.
+    """
+    index = closes.index.union(pd.DatetimeIndex(flows["day"].unique())).sort_values()
+    symbols = sorted(set(positions) | set(flows["symbol"]) | set(closes.columns))
+
+    traded = flows.pivot_table(index="day", columns="symbol", values="quantity", aggfunc="sum") \
+        if len(flows) else pd.DataFrame(index=pd.DatetimeIndex([]))
+    held = traded.reindex(index=index, columns=symbols, fill_value=0).fillna(0).cumsum() \
+        + pd.Series(positions, dtype="float64").reindex(symbols, fill_value=0)
+    # Weekends, holidays and today before its bar lands take the last stored close; only a
+    # symbol with no bar at all is carried at zero
+    prices = closes.reindex(index=index, columns=symbols).ffill().fillna(0.0)
+
+    market_value = (held.to_numpy() * prices.to_numpy()).sum(axis=1)
+    cash_series = cash + flows.groupby("day")["cash_delta"].sum().reindex(index, fill_value=0).cumsum()
+    curve = pd.DataFrame({
+        "cash": cash_series.to_numpy(),
+        "market_value": market_value,
+        "value": cash_series.to_numpy() + market_value
+    }, index=index)
+    return curve if start is None else curve[curve.index >= start]
+
+
+class EquityService:
+    """Per-user equity curves rebuilt from the transaction log, cached and extended incrementally"""
+
+    def __init__(self):
+        self.curves = AsyncTTLCache(
+            "equity-curves",
+            ttl_seconds=float(os.getenv("EQUITY_CURVE_TTL_SECONDS", 3600)),
+            max_entries=int(os.getenv("EQUITY_CURVE_MAX_ENTRIES", 2000))
+        )
+
+    async def _new_transactions(self, db: AsyncSession, user_id: int, after_id: int) -> pd.DataFrame:
+        result = await db.execute(
+            select(transactions.c.id, transactions.c.created_at, transactions.c.symbol,
+                   transactions.c.type, transactions.c.quantity, transactions.c.total).where(
+                transactions.c.user_id == user_id,
+                transactions.c.id > after_id
+            ).order_by(transactions.c.id)
+        )
+        rows = pd.DataFrame(result.all(), columns=["id", "created_at", "symbol", "type", "quantity", "total"])
+        sign = rows["type"].map({"buy": 1, "sell": -1}).fillna(0)
+        return pd.DataFrame({
+            "id": rows["id"],
+            "day": _to_day(rows["created_at"]) if len(rows) else pd.Series([], dtype="datetime64[ns]"),
+            "symbol": rows["symbol"],
+            "quantity": sign * rows["quantity"],
+            "cash_delta": -sign * rows["total"]
+        })
+
+    async def _closes(self, db: AsyncSession, symbols: List[str], since: pd.Timestamp) -> pd.DataFrame:
+        """Daily closes from `since` on, plus each symbol's last close before it for replay to carry in"""
+        if not symbols:
+            return pd.DataFrame(index=pd.DatetimeIndex([]))
+        columns = (market_data.c.date, market_data.c.symbol, market_data.c.close_price)
+        since_utc = since.tz_localize("UTC").to_pydatetime()
+        result = await db.execute(select(*columns).where(
+            market_data.c.symbol.in_(symbols),
+            market_data.c.interval == "1d",
+            market_data.c.date >= since_utc
+        ))
+        rows = result.all()
+        result = await db.execute(
+            select(*columns).distinct(market_data.c.symbol).where(
+                market_data.c.symbol.in_(symbols),
+                market_data.c.interval == "1d",
+                market_data.c.date < since_utc
+            ).order_by(market_data.c.symbol, market_data.c.date.desc())
+        )
+        rows += result.all()
+        bars = pd.DataFrame(rows, columns=["date", "symbol", "close"])
+        if bars.empty:
+            return pd.DataFrame(index=pd.DatetimeIndex([]))
+        bars["date"] = _to_day(bars["date"]).to_numpy()
+        return bars.pivot_table(index="date", columns="symbol", values="close", aggfunc="last").sort_index()
+
+    async def _build(self, db: AsyncSession, user_id: int) -> EquityCurve:
+        flows = await self._new_transactions(db, user_id, 0)
+        result = await db.execute(select(users.c.balance).where(users.c.id == user_id))
+        balance = result.scalar_one_or_none() or 0.0
+        # Starting cash is today's balance with every trade's cash flow undone
+        curve = EquityCurve(cash=balance - float(flows["cash_delta"].sum()))
+        return await self._extend(db, curve, flows)
+
+    async def _load(self, user_id: int) -> EquityCurve:
+        # Concurrent first calls share this build, so it runs on its own session
+        async with AsyncSessionLocal() as db:
+            return await self._build(db, user_id)
+
+    async def _extend(self, db: AsyncSession, curve: EquityCurve, new_flows: pd.DataFrame) -> EquityCurve:
+        """Replay from the open day onwards with the pending and new transactions; earlier rows are kept"""
+        flows = pd.concat([curve.pending, new_flows], ignore_index=True) if len(curve.pending) else new_flows
+        if curve.open_date is None and flows.empty:
+            return curve
+
+        start = curve.open_date if curve.open_date is not None else flows["day"].min()
+        symbols = sorted({s for s, q in curve.positions.items() if q} | set(flows["symbol"]))
+        closes = await self._closes(db, symbols, start)
+        segment = replay(closes, flows, curve.positions, curve.cash, start)
+        if segment.empty:
+            return curve
+
+        extended = EquityCurve(curve.cash)
+        extended.rows = pd.concat([curve.rows[curve.rows.index < start], segment]) if len(curve.rows) else segment
+        extended.open_date = segment.index[-1]
+        settled = flows[flows["day"] < extended.open_date]
+        extended.positions = dict(curve.positions)
+        for symbol, quantity in settled.groupby("symbol")["quantity"].sum().items():
+            extended.positions[symbol] = extended.positions.get(symbol, 0) + quantity
+        extended.cash = curve.cash + float(settled["cash_delta"].sum())
+        extended.pending = flows[flows["day"] >= extended.open_date]
+        extended.last_transaction_id = int(max(curve.last_transaction_id, flows["id"].max() if len(flows) else 0))
+        return extended
+
+    async def get_curve(self, db: AsyncSession, user_id: int, start: Optional[pd.Timestamp] = None) -> List[dict]:
+        curve = self.curves.get(user_id)
+        if curve is None:
+            curve = await self.curves.get_or_load(user_id, lambda: self._load(user_id))
+        else:
+            new_flows = await self._new_transactions(db, user_id, curve.last_transaction_id)
+            if curve.open_date is not None and len(new_flows) and new_flows["day"].min() < curve.open_date:
+                # Dated before the open day (should not happen with server timestamps): replay from scratch
+                curve = await self._build(db, user_id)
+            else:
+                # Also picks up bars ingested since the last call, the open day is always recomputed
+                curve = await self._extend(db, curve, new_flows)
+            self.curves.set(user_id, curve)
+
+        rows = curve.rows if start is None else curve.rows[curve.rows.index >= start]
+        return [
+            {"date": date.date().isoformat(), "cash": round(cash, 2),
+             "market_value": round(market_value, 2), "value": round(value, 2)}
+            for date, cash, market_value, value in zip(
+                rows.index, rows["cash"].tolist(), rows["market_value"].tolist(), rows["value"].tolist()
+            )
+        ]
+
+equity_service = EquityService()
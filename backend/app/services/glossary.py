@@ -0,0 +1,117 @@
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_GLOSSARY_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "glossary.json")
+
+# Characters that join a term ("p/e", "e.p.s.") vs. ones that separate words ("buy-and-hold")
+_JOINERS = re.compile(r"[/.'’`]")
+_SEPARATORS = re.compile(r"[^a-z0-9]+")
+_QUESTION_PREFIX = re.compile(r"^(what is|what are|whats|what s|define|definition of|explain|meaning of)\s+")
+_ARTICLES = re.compile(r"^(a|an|the)\s+")
+
+
+def fold(term: str) -> str:
+    """Case, unicode, punctuation and whitespace folding: ' P/E  Ratio? ' -> 'pe ratio'"""
+    text = unicodedata.normalize("NFKC", term).lower().replace("&", " and ")
+    text = _SEPARATORS.sub(" ", _JOINERS.sub("", text)).strip()
+    text = _QUESTION_PREFIX.sub("", text)
+    return _ARTICLES.sub("", text)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up (returns limit + 1) once every path exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class Resolution(NamedTuple):
+    key: str
+    method: str  # "canonical", "alias", "fuzzy" or "folded" (not in the glossary)
+    canonical: Optional[str]
+
+
+class Glossary:
+    """Canonical financial terms, their aliases and offline explanations
+
+    Every canonical term and alias is folded once at load time into an exact
+    lookup table; the same folded keys are bucketed by length, so typo matching
+    only compares against keys whose length is within the allowed distance.
+    """
+
+    def __init__(self, entries: List[dict]):
+        self.explanations: Dict[str, str] = {}
+        self.lookup: Dict[str, str] = {}
+        for entry in entries:
+            canonical = fold(entry["term"])
+            self.explanations[canonical] = entry["explanation"]
+            self.lookup[canonical] = canonical
+            for alias in entry.get("aliases", []):
+                self.lookup.setdefault(fold(alias), canonical)
+
+        self.by_length: Dict[int, List[str]] = defaultdict(list)
+        for key in self.lookup:
+            self.by_length[len(key)].append(key)
+
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    @classmethod
+    def load(cls, path: str) -> "Glossary":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def max_distance(key: str) -> int:
+        # Short terms ("eps", "roe") are too easy to confuse with each other to fuzz
+        if len(key) < 4:
+            return 0
+        return 1 if len(key) < 9 else 2
+
+    def _nearest(self, key: str) -> Optional[str]:
+        limit = self.max_distance(key)
+        best, best_distance = None, limit + 1
+        for length in range(len(key) - limit, len(key) + limit + 1):
+            for candidate in self.by_length.get(length, ()):
+                distance = edit_distance(key, candidate, min(limit, best_distance - 1))
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        return best
+
+    def resolve(self, term: str) -> Resolution:
+        """Map a user-typed term to the cache key shared by all its variants"""
+        key = fold(term)
+        canonical = self.lookup.get(key)
+        if canonical is not None:
+            resolution = Resolution(canonical, "canonical" if canonical == key else "alias", canonical)
+        else:
+            nearest = self._nearest(key) if self.max_distance(key) else None
+            if nearest is not None:
+                canonical = self.lookup[nearest]
+                resolution = Resolution(canonical, "fuzzy", canonical)
+            else:
+                resolution = Resolution(key, "folded", None)
+        self.counts[resolution.method] += 1
+        return resolution
+
+    def explanation(self, canonical: Optional[str]) -> Optional[str]:
+        return self.explanations.get(canonical) if canonical else None
+
+    def stats(self) -> dict:
+        return {"entries": len(self.explanations), "keys": len(self.lookup), "resolutions": dict(self.counts)}
+
+glossary = Glossary.load(os.getenv("GLOSSARY_FILE", DEFAULT_GLOSSARY_FILE))
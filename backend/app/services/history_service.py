@@ -0,0 +1,165 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from ..database import AsyncSessionLocal
+from .blocking import market_data_gateway
+from .market_data import market_data_provider
+from .price_refresher import price_refresher
+from .scheduler import PeriodicJob
+
+load_dotenv()
+
+market_data = models.MarketData.__table__
+
+# Longest history yfinance serves for each bar size
+MAX_BACKFILL_PERIODS = {"1m": "7d", "5m": "60d", "15m": "60d", "30m": "60d", "1h": "730d", "1d": "max"}
+
+
+class HistoryService:
+    """Backfills and incrementally appends OHLCV bars into market_data"""
+
+    def __init__(self):
+        self.intervals = [i.strip() for i in os.getenv("HISTORY_INTERVALS", "1d").split(",") if i.strip()]
+        self.daily_backfill_period = os.getenv("HISTORY_BACKFILL_PERIOD", "5y")
+        self.batch_size = int(os.getenv("HISTORY_BATCH_SIZE", 50))
+        # 2000 rows x 8 columns stays under asyncpg's bind parameter limit
+        self.chunk_size = int(os.getenv("HISTORY_UPSERT_CHUNK_SIZE", 2000))
+        self.job = PeriodicJob(
+            "history-ingestion",
+            float(os.getenv("HISTORY_INGEST_INTERVAL_SECONDS", 3600)),
+            self.ingest_tracked
+        )
+        self.listeners = []
+
+    def start(self):
+        self.job.start()
+
+    async def stop(self):
+        await self.job.stop()
+
+    def add_listener(self, listener):
+        """Register a coroutine called with the rows written by each ingestion"""
+        self.listeners.append(listener)
+
+    def backfill_period(self, interval: str) -> str:
+        if interval == "1d":
+            return self.daily_backfill_period
+        return MAX_BACKFILL_PERIODS.get(interval, "60d")
+
+    @staticmethod
+    def frame_to_rows(hist: pd.DataFrame, interval: str,
+                      since: Optional[Dict[str, datetime]] = None) -> List[dict]:
+        """Reshape a (field, symbol) history frame into market_data rows, dropping bars before `since`"""
+        if hist.empty:
+            return []
+        bars = hist.stack(level=1).reset_index()
+        bars.columns = ["date", "symbol"] + list(bars.columns[2:])
+        bars = bars.dropna(subset=["Close"])
+        bars["date"] = pd.to_datetime(bars["date"], utc=True)
+
+        if since:
+            # Keep the latest stored bar too: the current day's bar is revised until the close
+            cutoff = bars["symbol"].map(since)
+            bars = bars[cutoff.isna() | (bars["date"] >= pd.to_datetime(cutoff, utc=True))]
+
+        return [
+            {
+                "symbol": row.symbol,
+                "interval": interval,
+                "date": row.date.to_pydatetime(),
+                "open_price": float(row.Open),
+                "high_price": float(row.High),
+                "low_price": float(row.Low),
+                "close_price": float(row.Close),
+                "volume": int(row.Volume) if not pd.isna(row.Volume) else 0
+            }
+            for row in bars.itertuples(index=False)
+        ]
+
+    async def upsert_bars(self, db: AsyncSession, rows: List[dict]) -> int:
+        """Multi-row INSERT .. ON CONFLICT (symbol, interval, date) per chunk, safe to re-run"""
+        for start in range(0, len(rows), self.chunk_size):
+            stmt = pg_insert(market_data).values(rows[start:start + self.chunk_size])
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[market_data.c.symbol, market_data.c.interval, market_data.c.date],
+                set_={
+                    "open_price": stmt.excluded.open_price,
+                    "high_price": stmt.excluded.high_price,
+                    "low_price": stmt.excluded.low_price,
+                    "close_price": stmt.excluded.close_price,
+                    "volume": stmt.excluded.volume
+                }
+            ))
+        await db.commit()
+        return len(rows)
+
+    async def latest_dates(self, db: AsyncSession, symbols: List[str], interval: str) -> Dict[str, datetime]:
+        result = await db.execute(
+            select(market_data.c.symbol, func.max(market_data.c.date)).where(
+                market_data.c.symbol.in_(symbols),
+                market_data.c.interval == interval
+            ).group_by(market_data.c.symbol)
+        )
+        return dict(result.all())
+
+    async def ingest(self, db: AsyncSession, symbols: List[str], interval: str = "1d") -> List[dict]:
+        """Backfill symbols with no history and append new bars for the rest; returns the rows written"""
+        latest = await self.latest_dates(db, symbols, interval)
+        new_symbols = [symbol for symbol in symbols if symbol not in latest]
+        known_symbols = [symbol for symbol in symbols if symbol in latest]
+
+        written = []
+        for batch in self._batches(new_symbols):
+            hist = await market_data_gateway.run(
+                market_data_provider.download_history, batch, period=self.backfill_period(interval), interval=interval
+            )
+            rows = self.frame_to_rows(hist, interval)
+            await self.upsert_bars(db, rows)
+            written.extend(rows)
+
+        for batch in self._batches(known_symbols):
+            start = min(latest[symbol] for symbol in batch).date().isoformat()
+            hist = await market_data_gateway.run(
+                market_data_provider.download_history, batch, start=start, interval=interval
+            )
+            rows = self.frame_to_rows(hist, interval, since={symbol: latest[symbol] for symbol in batch})
+            await self.upsert_bars(db, rows)
+            written.extend(rows)
+
+        for listener in self.listeners:
+            try:
+                await listener(written)
+            except Exception as e:
+                print(f"Error in history listener: {e}")
+        return written
+
+    def _batches(self, symbols: List[str]):
+        for start in range(0, len(symbols), self.batch_size):
+            yield symbols[start:start + self.batch_size]
+
+    async def ingest_tracked(self):
+        symbols = sorted(price_refresher.tracked)
+        async with AsyncSessionLocal() as db:
+            for interval in self.intervals:
+                rows = await self.ingest(db, symbols, interval)
+                print(f"History ingestion ({interval}): wrote {len(rows)} bars for {len(symbols)} symbols")
+
+    def range_query(self, symbol: str, interval: str = "1d",
+                    start: Optional[datetime] = None, end: Optional[datetime] = None):
+        query = select(
+            market_data.c.date, market_data.c.open_price, market_data.c.high_price,
+            market_data.c.low_price, market_data.c.close_price, market_data.c.volume
+        ).where(market_data.c.symbol == symbol, market_data.c.interval == interval)
+        if start:
+            query = query.where(market_data.c.date >= start)
+        if end:
+            query = query.where(market_data.c.date <= end)
+        return query.order_by(market_data.c.date)
+
+history_service = HistoryService()
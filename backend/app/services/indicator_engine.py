@@ -0,0 +1,349 @@
+import math
+import os
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from ..database import AsyncSessionLocal
+from .cache import AsyncTTLCache
+
+load_dotenv()
+
+SMA_PERIOD = 20
+EMA_PERIOD = 20
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_PERIOD, BOLLINGER_WIDTH = 20, 2.0
+ATR_PERIOD = 14
+
+# The vectorized functions take a 1-D series or a 2-D (time x symbol) matrix and
+# work down axis 0, so the same code serves one symbol or the whole universe.
+
+
+def _as_2d(x) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    return x.reshape(-1, 1) if x.ndim == 1 else x
+
+
+def _shape_like(out: np.ndarray, x) -> np.ndarray:
+    return out.ravel() if np.ndim(x) == 1 else out
+
+
+def rolling_mean_std(x, n: int):
+    data = _as_2d(x)
+    mean = np.full(data.shape, np.nan)
+    std = np.full(data.shape, np.nan)
+    if len(data) >= n:
+        windows = np.lib.stride_tricks.sliding_window_view(data, n, axis=0)
+        mean[n - 1:] = windows.mean(axis=-1)
+        std[n - 1:] = windows.std(axis=-1)
+    return _shape_like(mean, x), _shape_like(std, x)
+
+
+def sma(x, n: int = SMA_PERIOD) -> np.ndarray:
+    return rolling_mean_std(x, n)[0]
+
+
+def ema(x, n: int = EMA_PERIOD) -> np.ndarray:
+    """Exponential average seeded with the first value, NaNs are skipped"""
+    data = _as_2d(x)
+    alpha = 2.0 / (n + 1)
+    out = np.full(data.shape, np.nan)
+    prev = np.full(data.shape[1], np.nan)
+    for t in range(len(data)):
+        value = data[t]
+        valid = ~np.isnan(value)
+        prev = np.where(valid, np.where(np.isnan(prev), value, alpha * value + (1 - alpha) * prev), prev)
+        out[t] = prev
+    return _shape_like(out, x)
+
+
+def wilder(x, n: int) -> np.ndarray:
+    """Wilder smoothing: mean of the first n values, then avg = (avg * (n - 1) + x) / n"""
+    data = _as_2d(x)
+    out = np.full(data.shape, np.nan)
+    count = np.zeros(data.shape[1])
+    total = np.zeros(data.shape[1])
+    avg = np.full(data.shape[1], np.nan)
+    for t in range(len(data)):
+        value = data[t]
+        valid = ~np.isnan(value)
+        count = count + valid
+        total = np.where(valid & (count <= n), total + np.nan_to_num(value), total)
+        avg = np.where(valid & (count == n), total / n, avg)
+        avg = np.where(valid & (count > n), (avg * (n - 1) + np.nan_to_num(value)) / n, avg)
+        out[t] = np.where(count >= n, avg, np.nan)
+    return _shape_like(out, x)
+
+
+def _diff(x) -> np.ndarray:
+    data = _as_2d(x)
+    delta = np.full(data.shape, np.nan)
+    delta[1:] = data[1:] - data[:-1]
+    return delta
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        return np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + rs))
+
+
+def rsi(close, n: int = RSI_PERIOD) -> np.ndarray:
+    delta = _diff(close)
+    avg_gain = wilder(np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None)), n)
+    avg_loss = wilder(np.where(np.isnan(delta), np.nan, np.clip(-delta, 0, None)), n)
+    return _shape_like(_rsi_from_averages(avg_gain, avg_loss), close)
+
+
+def macd(close, fast: int = MACD_FAST, slow: int = MACD_SLOW, signal: int = MACD_SIGNAL):
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close, n: int = BOLLINGER_PERIOD, width: float = BOLLINGER_WIDTH):
+    mid, std = rolling_mean_std(close, n)
+    return mid - width * std, mid, mid + width * std
+
+
+def true_range(high, low, close) -> np.ndarray:
+    high, low, close = _as_2d(high), _as_2d(low), _as_2d(close)
+    prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    # fmax skips NaN, so the first bar (no previous close) is just high - low
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def atr(high, low, close, n: int = ATR_PERIOD) -> np.ndarray:
+    return _shape_like(wilder(true_range(high, low, close), n), close)
+
+
+def latest_values(high, low, close) -> Dict[str, np.ndarray]:
+    """Latest value of every indicator for each column of (time x symbol) matrices"""
+    close = _as_2d(close)
+    lower, mid, upper = bollinger(close)
+    line, signal_line, histogram = macd(close)
+    values = {
+        "close": close,
+        "sma": sma(close),
+        "ema": ema(close),
+        "rsi": rsi(close),
+        "macd": line,
+        "macd_signal": signal_line,
+        "macd_histogram": histogram,
+        "bollinger_lower": lower,
+        "bollinger_middle": mid,
+        "bollinger_upper": upper,
+        "atr": atr(high, low, close)
+    }
+    return {name: series[-1] for name, series in values.items()}
+
+
+class _Wilder:
+    def __init__(self, n: int):
+        self.n = n
+        self.count = 0
+        self.total = 0.0
+        self.avg = math.nan
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        if self.count <= self.n:
+            self.total += value
+            if self.count == self.n:
+                self.avg = self.total / self.n
+        else:
+            self.avg = (self.avg * (self.n - 1) + value) / self.n
+        return self.avg
+
+
+class _Ema:
+    def __init__(self, n: int):
+        self.alpha = 2.0 / (n + 1)
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        self.value = value if math.isnan(self.value) else self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+
+class IndicatorState:
+    """Running indicator state for one symbol, each new bar costs O(1)
+
+    The same recurrences as the vectorized functions above, so replaying a series
+    bar by bar gives the same values. A bar with the same date as the last one
+    (the still-open current day) replaces it instead of being appended.
+    """
+
+    def __init__(self):
+        self.window = deque(maxlen=max(SMA_PERIOD, BOLLINGER_PERIOD))
+        self.window_sum = 0.0
+        self.window_sumsq = 0.0
+        self.ema = _Ema(EMA_PERIOD)
+        self.ema_fast = _Ema(MACD_FAST)
+        self.ema_slow = _Ema(MACD_SLOW)
+        self.macd_signal = _Ema(MACD_SIGNAL)
+        self.avg_gain = _Wilder(RSI_PERIOD)
+        self.avg_loss = _Wilder(RSI_PERIOD)
+        self.atr = _Wilder(ATR_PERIOD)
+        self.prev_close = math.nan
+        self.last_date: Optional[datetime] = None
+        self.last_close = math.nan
+        self._before_last: Optional[dict] = None
+
+    def _snapshot(self) -> dict:
+        snapshot = {
+            name: (value.copy() if isinstance(value, deque) else value)
+            for name, value in self.__dict__.items() if name != "_before_last"
+        }
+        # The small recurrence objects are copied by value
+        for name in ("ema", "ema_fast", "ema_slow", "macd_signal", "avg_gain", "avg_loss", "atr"):
+            clone = object.__new__(type(snapshot[name]))
+            clone.__dict__.update(snapshot[name].__dict__)
+            snapshot[name] = clone
+        return snapshot
+
+    def update(self, date: datetime, high: float, low: float, close: float):
+        if self.last_date is not None:
+            if date < self.last_date:
+                return
+            if date == self.last_date:
+                self.__dict__.update(self._before_last)
+        self._before_last = self._snapshot()
+
+        if len(self.window) == self.window.maxlen:
+            dropped = self.window[0]
+            self.window_sum -= dropped
+            self.window_sumsq -= dropped * dropped
+        self.window.append(close)
+        self.window_sum += close
+        self.window_sumsq += close * close
+
+        self.ema.update(close)
+        fast = self.ema_fast.update(close)
+        slow = self.ema_slow.update(close)
+        self.macd_signal.update(fast - slow)
+
+        if not math.isnan(self.prev_close):
+            delta = close - self.prev_close
+            self.avg_gain.update(max(delta, 0.0))
+            self.avg_loss.update(max(-delta, 0.0))
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        else:
+            tr = high - low
+        self.atr.update(tr)
+
+        self.prev_close = close
+        self.last_close = close
+        self.last_date = date
+
+    def values(self) -> dict:
+        n = len(self.window)
+        full = n == self.window.maxlen
+        mean = self.window_sum / n if n else math.nan
+        std = math.sqrt(max(self.window_sumsq / n - mean * mean, 0.0)) if n else math.nan
+        macd_line = self.ema_fast.value - self.ema_slow.value
+        if self.avg_loss.count < RSI_PERIOD:
+            rsi_value = math.nan
+        elif self.avg_loss.avg == 0:
+            rsi_value = 100.0
+        else:
+            rsi_value = 100 - 100 / (1 + self.avg_gain.avg / self.avg_loss.avg)
+        return {
+            "close": self.last_close,
+            "sma": mean if full else math.nan,
+            "ema": self.ema.value,
+            "rsi": rsi_value,
+            "macd": macd_line,
+            "macd_signal": self.macd_signal.value,
+            "macd_histogram": macd_line - self.macd_signal.value,
+            "bollinger_lower": mean - BOLLINGER_WIDTH * std if full else math.nan,
+            "bollinger_middle": mean if full else math.nan,
+            "bollinger_upper": mean + BOLLINGER_WIDTH * std if full else math.nan,
+            "atr": self.atr.avg if self.atr.count >= ATR_PERIOD else math.nan
+        }
+
+
+def _clean(values: dict) -> dict:
+    return {name: (None if value is None or math.isnan(value) else round(float(value), 4))
+            for name, value in values.items()}
+
+
+class IndicatorEngine:
+    """Per-symbol indicator state kept current by history ingestion, plus universe-wide screens"""
+
+    def __init__(self):
+        self.states: Dict[str, IndicatorState] = {}
+        self.lookback_days = int(os.getenv("INDICATOR_LOOKBACK_DAYS", 400))
+        # Screens only change when new bars land, on_bars clears this
+        self.universe_cache = AsyncTTLCache(
+            "indicator-universe",
+            ttl_seconds=float(os.getenv("INDICATOR_UNIVERSE_TTL_SECONDS", 3600)),
+            max_entries=16
+        )
+
+    async def _load_bars(self, db: AsyncSession, symbols: List[str]) -> pd.DataFrame:
+        market_data = models.MarketData.__table__
+        start = datetime.now(timezone.utc) - timedelta(days=self.lookback_days)
+        result = await db.execute(
+            select(market_data.c.symbol, market_data.c.date, market_data.c.high_price,
+                   market_data.c.low_price, market_data.c.close_price).where(
+                market_data.c.symbol.in_(symbols),
+                market_data.c.interval == "1d",
+                market_data.c.date >= start
+            ).order_by(market_data.c.date)
+        )
+        return pd.DataFrame(result.all(), columns=["symbol", "date", "high", "low", "close"])
+
+    async def get(self, db: AsyncSession, symbol: str) -> Optional[dict]:
+        state = self.states.get(symbol)
+        if state is None:
+            bars = await self._load_bars(db, [symbol])
+            if bars.empty:
+                return None
+            # One-off warm-up per symbol, after this ingestion keeps it current bar by bar
+            state = IndicatorState()
+            for row in bars.itertuples(index=False):
+                state.update(row.date, row.high, row.low, row.close)
+            self.states[symbol] = state
+        return {"symbol": symbol, "as_of": state.last_date, **_clean(state.values())}
+
+    async def on_bars(self, rows: Iterable[dict]):
+        """Apply freshly ingested daily bars to the symbols we already hold state for"""
+        self.universe_cache.clear()
+        for row in sorted(rows, key=lambda row: row["date"]):
+            state = self.states.get(row["symbol"])
+            if state is not None and row["interval"] == "1d":
+                state.update(row["date"], row["high_price"], row["low_price"], row["close_price"])
+
+    async def universe(self, symbols: List[str]) -> List[dict]:
+        key = tuple(sorted(symbols))
+        return await self.universe_cache.get_or_load(key, lambda: self._load_universe(list(key)))
+
+    async def _load_universe(self, symbols: List[str]) -> List[dict]:
+        # Shared by every request waiting on the key, so it runs on its own session
+        async with AsyncSessionLocal() as db:
+            return await self.compute_universe(db, symbols)
+
+    async def compute_universe(self, db: AsyncSession, symbols: List[str]) -> List[dict]:
+        """Latest indicators for every symbol at once, on aligned (date x symbol) matrices"""
+        bars = await self._load_bars(db, symbols)
+        if bars.empty:
+            return []
+        frames = {
+            field: bars.pivot(index="date", columns="symbol", values=field).ffill()
+            for field in ("high", "low", "close")
+        }
+        latest = latest_values(frames["high"].to_numpy(), frames["low"].to_numpy(), frames["close"].to_numpy())
+        columns = frames["close"].columns
+        return [
+            {"symbol": symbol, **_clean({name: values[i] for name, values in latest.items()})}
+            for i, symbol in enumerate(columns)
+        ]
+
+indicator_engine = IndicatorEngine()
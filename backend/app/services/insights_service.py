@@ -0,0 +1,165 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from ..database import AsyncSessionLocal
+from .ai_service import ai_service
+from .blocking import gemini_gateway
+from .llm_scheduler import BACKGROUND, llm_scheduler
+from .scheduler import PeriodicJob
+
+load_dotenv()
+
+insight_windows = models.MarketInsightWindow.__table__
+stocks = models.Stock.__table__
+
+
+class InsightsService:
+    """Market insights generated once per window in the background and served from memory
+
+    Windows are aligned to the epoch, so every worker agrees on the current one.
+    The worker that inserts the window's row makes the single LLM call; the others
+    pick the stored result up on a later poll. Until then the previous window's
+    insights keep being served, or rule-based ones from the stocks table on a
+    fresh deployment.
+    """
+
+    def __init__(self):
+        self.window = float(os.getenv("INSIGHTS_WINDOW_SECONDS", 3600))
+        # A generation is over by the time its queue deadline and call timeout have both passed,
+        # so a claim still pending after that belongs to a worker that died and can be taken over
+        self.claim_timeout = float(os.getenv(
+            "INSIGHTS_CLAIM_TIMEOUT_SECONDS", llm_scheduler.deadlines[BACKGROUND] + gemini_gateway.timeout
+        ))
+        self.movers = int(os.getenv("INSIGHTS_MOVERS", 5))
+        self.current: List[dict] = []
+        self.current_window: Optional[datetime] = None
+        self.job = PeriodicJob(
+            "market-insights",
+            min(self.window, float(os.getenv("INSIGHTS_POLL_SECONDS", 60))),
+            self.refresh
+        )
+
+    def start(self):
+        self.job.start()
+
+    async def stop(self):
+        await self.job.stop()
+
+    def window_start(self, now: Optional[datetime] = None) -> datetime:
+        now = now or datetime.now(timezone.utc)
+        return datetime.fromtimestamp(now.timestamp() // self.window * self.window, tz=timezone.utc)
+
+    async def market_context(self, db: AsyncSession) -> dict:
+        """Movers, sector averages and breadth from the stocks table, the facts the model may cite"""
+        columns = (stocks.c.symbol, stocks.c.name, stocks.c.sector, stocks.c.current_price, stocks.c.change_percent)
+        gainers = await db.execute(
+            select(*columns).where(stocks.c.change_percent.isnot(None))
+            .order_by(stocks.c.change_percent.desc()).limit(self.movers)
+        )
+        losers = await db.execute(
+            select(*columns).where(stocks.c.change_percent.isnot(None))
+            .order_by(stocks.c.change_percent.asc()).limit(self.movers)
+        )
+        sectors = await db.execute(
+            select(stocks.c.sector, func.avg(stocks.c.change_percent), func.count())
+            .where(stocks.c.sector.isnot(None), stocks.c.change_percent.isnot(None))
+            .group_by(stocks.c.sector).order_by(func.avg(stocks.c.change_percent).desc())
+        )
+        breadth = await db.execute(select(
+            func.count().filter(stocks.c.change_percent > 0),
+            func.count().filter(stocks.c.change_percent < 0)
+        ))
+        advancers, decliners = breadth.one()
+
+        movers = {}
+        for row in list(gainers.all()) + list(reversed(losers.all())):
+            movers[row.symbol] = {
+                "symbol": row.symbol,
+                "name": row.name,
+                "sector": row.sector,
+                "price": row.current_price,
+                "change_percent": round(row.change_percent, 2)
+            }
+        return {
+            # Best to worst, as grounded_insights expects
+            "movers": sorted(movers.values(), key=lambda m: -m["change_percent"]),
+            "sectors": [
+                {"sector": sector, "avg_change_percent": round(avg, 2), "stocks": count}
+                for sector, avg, count in sectors.all()
+            ],
+            "advancers": advancers,
+            "decliners": decliners
+        }
+
+    async def _claim(self, db: AsyncSession, window: datetime) -> bool:
+        result = await db.execute(
+            pg_insert(insight_windows).values(window_start=window, status="pending")
+            .on_conflict_do_nothing(index_elements=[insight_windows.c.window_start])
+            .returning(insight_windows.c.window_start)
+        )
+        if result.scalar_one_or_none() is None:
+            result = await db.execute(
+                update(insight_windows).where(
+                    insight_windows.c.window_start == window,
+                    insight_windows.c.status == "pending",
+                    insight_windows.c.created_at < func.now() - timedelta(seconds=self.claim_timeout)
+                ).values(created_at=func.now()).returning(insight_windows.c.window_start)
+            )
+            if result.scalar_one_or_none() is None:
+                return False
+        await db.commit()
+        return True
+
+    async def _latest_ready(self, db: AsyncSession) -> Optional[List[dict]]:
+        result = await db.execute(
+            select(insight_windows.c.insights).where(insight_windows.c.status == "ready")
+            .order_by(insight_windows.c.window_start.desc()).limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def _stopgap(self, db: AsyncSession) -> List[dict]:
+        """Last window any worker finished, else rule-based insights over the stocks table"""
+        return await self._latest_ready(db) or ai_service.grounded_insights(await self.market_context(db))
+
+    async def refresh(self):
+        window = self.window_start()
+        if window == self.current_window:
+            return
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(insight_windows.c.status, insight_windows.c.insights)
+                .where(insight_windows.c.window_start == window)
+            )
+            row = result.one_or_none()
+            if row is not None and row.status == "ready":
+                self.current, self.current_window = row.insights, window
+                return
+            if not self.current:
+                self.current = await self._stopgap(db)
+            if not await self._claim(db, window):
+                # Another worker is generating this window
+                return
+            market = await self.market_context(db)
+
+        # The claim is committed and the session closed: no connection is held while the model runs
+        insights = await ai_service.generate_market_insights(market)
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(insight_windows).where(insight_windows.c.window_start == window)
+                .values(status="ready", insights=insights, updated_at=func.now())
+            )
+            await db.commit()
+        self.current, self.current_window = insights, window
+
+    async def get(self, db: AsyncSession) -> List[dict]:
+        if not self.current:
+            # This worker's first poll hasn't finished yet
+            self.current = await self._stopgap(db)
+        return self.current
+
+insights_service = InsightsService()
@@ -0,0 +1,111 @@
+from typing import Iterable, List, Optional
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+
+LEADERBOARD_PERIODS = ("day", "week", "month", "all")
+
+
+class LeaderboardService:
+    """Maintains the materialized leaderboard table incrementally"""
+
+    def _standings_query(self, *filters):
+        # Holdings are marked to market after every refresh, so no join against stocks is needed
+        portfolio_value = func.coalesce(func.sum(models.Portfolio.current_price * models.Portfolio.quantity), 0)
+        invested = func.coalesce(func.sum(models.Portfolio.avg_price * models.Portfolio.quantity), 0)
+        total_pnl = portfolio_value - invested
+        pnl_percentage = case((invested > 0, total_pnl / invested * 100), else_=0)
+
+        return select(
+            models.User.id,
+            models.User.username,
+            portfolio_value,
+            total_pnl,
+            pnl_percentage,
+            func.now()
+        ).select_from(models.User).outerjoin(
+            models.Portfolio, models.Portfolio.user_id == models.User.id
+        ).where(*filters).group_by(models.User.id, models.User.username)
+
+    async def _upsert(self, db: AsyncSession, *filters, commit: bool = True):
+        table = models.LeaderboardEntry.__table__
+        stmt = pg_insert(table).from_select(
+            ["user_id", "username", "portfolio_value", "total_pnl", "total_pnl_percentage", "updated_at"],
+            self._standings_query(*filters)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                "username": stmt.excluded.username,
+                "portfolio_value": stmt.excluded.portfolio_value,
+                "total_pnl": stmt.excluded.total_pnl,
+                "total_pnl_percentage": stmt.excluded.total_pnl_percentage,
+                "updated_at": stmt.excluded.updated_at
+            }
+        )
+        await db.execute(stmt)
+        if commit:
+            await db.commit()
+
+    async def rebuild(self, db: AsyncSession):
+        """Recompute every user's standing in one statement (startup / repair)"""
+        await self._upsert(db)
+
+    async def refresh_users(self, db: AsyncSession, user_ids: Iterable[int], commit: bool = True):
+        user_ids = list(user_ids)
+        if user_ids:
+            await self._upsert(db, models.User.id.in_(user_ids), commit=commit)
+
+    async def on_prices_changed(self, db: AsyncSession, symbols: Iterable[str]):
+        """Refresh only the users holding one of the symbols whose price moved"""
+        holders = select(models.Portfolio.user_id).where(models.Portfolio.symbol.in_(list(symbols)))
+        await self._upsert(db, models.User.id.in_(holders))
+
+    async def top(self, db: AsyncSession, limit: int = 10, offset: int = 0, period: str = "all") -> List[dict]:
+        entry = models.LeaderboardEntry
+        if period == "all":
+            query = select(entry).order_by(entry.portfolio_value.desc(), entry.user_id)
+        else:
+            # Period returns are refreshed by the snapshot job; users without a baseline yet are left out
+            column = getattr(entry, f"{period}_return")
+            query = select(entry).where(column.isnot(None)).order_by(column.desc().nullslast(), entry.user_id)
+        result = await db.execute(query.offset(offset).limit(limit))
+        return [
+            {
+                "id": entry.user_id,
+                "username": entry.username,
+                "portfolio_value": entry.portfolio_value,
+                "total_pnl": entry.total_pnl,
+                "total_pnl_percentage": entry.total_pnl_percentage,
+                "period_return": None if period == "all" else getattr(entry, f"{period}_return"),
+                "rank": offset + i + 1
+            }
+            for i, entry in enumerate(result.scalars().all())
+        ]
+
+    async def rank_of(self, db: AsyncSession, user_id: int) -> Optional[dict]:
+        """Rank and percentile from index range counts, without loading other users' values"""
+        entry = models.LeaderboardEntry
+        user_value = select(entry.portfolio_value).where(entry.user_id == user_id).scalar_subquery()
+        result = await db.execute(select(
+            user_value,
+            # Same tie-break as top(): equal values are ordered by user_id
+            select(func.count()).select_from(entry).where(or_(
+                entry.portfolio_value > user_value,
+                and_(entry.portfolio_value == user_value, entry.user_id < user_id)
+            )).scalar_subquery(),
+            select(func.count()).select_from(entry).scalar_subquery()
+        ))
+        value, above, total_users = result.one()
+        if value is None:
+            return None
+        
+        rank = above + 1
+        return {
+            "rank": rank,
+            "total_users": total_users,
+            "percentile": ((total_users - rank + 1) / total_users) * 100
+        }
+
+leaderboard_service = LeaderboardService()
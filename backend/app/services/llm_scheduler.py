@@ -0,0 +1,355 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional
+from dotenv import load_dotenv
+from .blocking import BlockingGateway, gemini_gateway
+
+load_dotenv()
+
+# Lower number = served first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class LLMSchedulerError(Exception):
+    """The request was not sent to the model; callers should fall back"""
+
+
+class LLMShedError(LLMSchedulerError):
+    pass
+
+
+class LLMCircuitOpenError(LLMSchedulerError):
+    pass
+
+
+def is_quota_error(error: Exception) -> bool:
+    try:
+        from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+        if isinstance(error, (ResourceExhausted, TooManyRequests)):
+            return True
+    except ImportError:
+        pass
+    return "quota" in str(error).lower() or "429" in str(error)
+
+
+class TokenBucket:
+    """Requests-per-minute budget with bursts, plus an optional pause after a quota error"""
+
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_available(self) -> float:
+        self._refill()
+        wait = max(self.paused_until - time.monotonic(), 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _Request:
+    __slots__ = ("priority", "seq", "deadline", "enqueued", "prompt", "future")
+
+    def __init__(self, priority: int, seq: int, deadline: float, prompt: Any, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.prompt = prompt
+        self.future = future
+
+    def __lt__(self, other: "_Request"):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class LLMScheduler:
+    """Single entry point for model calls
+
+    Requests wait in a bounded priority queue and are released at the rate the
+    token bucket allows. Queued requests whose deadline passes are shed instead
+    of being sent late, a full queue drops its lowest-priority entry for a more
+    important one, background work stops before the daily budget's interactive
+    reserve is touched, and repeated failures open a circuit that fails calls
+    fast until a trial call succeeds.
+    """
+
+    def __init__(self, gateway: BlockingGateway):
+        self.gateway = gateway
+        self.call: Optional[Callable[[Any], Any]] = None
+        self.bucket = TokenBucket(
+            float(os.getenv("LLM_REQUESTS_PER_MINUTE", 15)),
+            int(os.getenv("LLM_BURST", 5))
+        )
+        self.max_queue = int(os.getenv("LLM_MAX_QUEUE", 100))
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", gateway.max_concurrency))
+        self.deadlines = {
+            INTERACTIVE: float(os.getenv("LLM_INTERACTIVE_DEADLINE_SECONDS", 10)),
+            BACKGROUND: float(os.getenv("LLM_BACKGROUND_DEADLINE_SECONDS", 300))
+        }
+        self.daily_budget = int(os.getenv("LLM_DAILY_REQUEST_BUDGET", 1500))
+        self.interactive_reserve = float(os.getenv("LLM_INTERACTIVE_RESERVE", 0.2))
+        self.quota_backoff = float(os.getenv("LLM_QUOTA_BACKOFF_SECONDS", 60))
+        self.failure_threshold = int(os.getenv("LLM_CIRCUIT_FAILURES", 5))
+        self.recovery_seconds = float(os.getenv("LLM_CIRCUIT_RECOVERY_SECONDS", 30))
+
+        self._queue: List[_Request] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.in_flight = 0
+
+        self.budget_day = None
+        self.budget_used = 0
+        self.consecutive_failures = 0
+        self.circuit_open_until = 0.0
+        # The one request let through while half-open; only its outcome ends the trial
+        self.trial: Optional[_Request] = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.shed = {"deadline": 0, "overflow": 0, "budget": 0, "circuit": 0}
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def configure(self, call: Callable[[Any], Any]):
+        """Set the blocking model call (e.g. GenerativeModel.generate_content or a fake)"""
+        self.call = call
+
+    # Circuit breaker
+
+    @property
+    def circuit_state(self) -> str:
+        if self.consecutive_failures < self.failure_threshold:
+            return "closed"
+        return "open" if time.monotonic() < self.circuit_open_until else "half_open"
+
+    def _circuit_allows(self, request: _Request) -> bool:
+        state = self.circuit_state
+        if state == "closed":
+            return True
+        if state == "half_open" and self.trial is None:
+            self.trial = request
+            return True
+        return False
+
+    def _record(self, request: _Request, error: Optional[Exception]):
+        if request is self.trial:
+            self.trial = None
+        if error is None:
+            self.consecutive_failures = 0
+            self.completed += 1
+            return
+        self.failed += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.circuit_open_until = time.monotonic() + self.recovery_seconds
+        if is_quota_error(error):
+            self.bucket.pause(self.quota_backoff)
+
+    # Daily budget
+
+    def _budget_allows(self, priority: int) -> bool:
+        today = datetime.now(timezone.utc).date()
+        if today != self.budget_day:
+            self.budget_day, self.budget_used = today, 0
+        limit = self.daily_budget if priority == INTERACTIVE else self.daily_budget * (1 - self.interactive_reserve)
+        return self.budget_used < limit
+
+    # Queue
+
+    def _shed(self, request: _Request, reason: str):
+        self.shed[reason] += 1
+        if not request.future.done():
+            request.future.set_exception(LLMShedError(f"LLM request shed: {reason}"))
+
+    async def submit(self, prompt: Any, priority: int = INTERACTIVE, deadline: Optional[float] = None) -> Any:
+        if self.call is None:
+            raise LLMCircuitOpenError("No LLM backend configured")
+        if self.circuit_state == "open":
+            self.shed["circuit"] += 1
+            raise LLMCircuitOpenError("LLM circuit open after repeated failures")
+
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+
+        request = _Request(
+            priority, next(self._seq),
+            time.monotonic() + (self.deadlines[priority] if deadline is None else deadline),
+            prompt, loop.create_future()
+        )
+        if len(self._queue) >= self.max_queue:
+            lowest = max(self._queue)
+            if not request < lowest:
+                self.shed["overflow"] += 1
+                raise LLMShedError("LLM queue full")
+            self._queue.remove(lowest)
+            heapq.heapify(self._queue)
+            self._shed(lowest, "overflow")
+
+        self.submitted += 1
+        heapq.heappush(self._queue, request)
+        self._wakeup.set()
+        return await request.future
+
+    async def _dispatch(self):
+        slots = asyncio.Semaphore(self.max_concurrency)
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            expired = [r for r in self._queue if r.deadline <= now or r.future.done()]
+            if expired:
+                self._queue = [r for r in self._queue if r not in expired]
+                heapq.heapify(self._queue)
+                for request in expired:
+                    if not request.future.done():
+                        self._shed(request, "deadline")
+                continue
+
+            wait = self.bucket.time_until_available()
+            if wait > 0:
+                # Short naps so new higher-priority requests and deadlines are re-evaluated
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), min(wait, 0.5))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await slots.acquire()
+            if not self._queue:
+                slots.release()
+                continue
+            request = heapq.heappop(self._queue)
+            if request.future.done():
+                slots.release()
+                continue
+            if not self._budget_allows(request.priority):
+                slots.release()
+                self._shed(request, "budget")
+                continue
+            if not self._circuit_allows(request):
+                slots.release()
+                self._shed(request, "circuit")
+                continue
+
+            self.bucket.take()
+            self.budget_used += 1
+            waited = time.monotonic() - request.enqueued
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            asyncio.get_running_loop().create_task(self._execute(request, slots))
+
+    async def _execute(self, request: _Request, slots: asyncio.Semaphore):
+        self.in_flight += 1
+        try:
+            result = await self.gateway.run(self.call, request.prompt)
+        except Exception as e:
+            self._record(request, e)
+            if not request.future.done():
+                request.future.set_exception(e)
+        else:
+            self._record(request, None)
+            if not request.future.done():
+                request.future.set_result(result)
+        finally:
+            self.in_flight -= 1
+            slots.release()
+
+    def stats(self) -> dict:
+        dispatched = self.completed + self.failed
+        return {
+            "queue_depth": len(self._queue),
+            "queue_by_priority": {
+                name: sum(1 for r in self._queue if r.priority == priority)
+                for priority, name in PRIORITY_NAMES.items()
+            },
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "shed": dict(self.shed),
+            "avg_wait_seconds": round(self.total_wait / dispatched, 4) if dispatched else 0.0,
+            "max_wait_seconds": round(self.max_wait, 4),
+            "tokens_available": round(self.bucket.tokens, 2),
+            "budget_used_today": self.budget_used,
+            "daily_budget": self.daily_budget,
+            "circuit": self.circuit_state
+        }
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModel:
+    """Local stand-in for GenerativeModel for load tests: configurable latency and failures, no network"""
+
+    def __init__(self, latency_ms: float = 300, jitter_ms: float = 200,
+                 failure_rate: float = 0.0, quota_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.failure_rate = failure_rate
+        self.quota_rate = quota_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def generate_content(self, prompt: str) -> FakeResponse:
+        self.calls += 1
+        time.sleep(max(self.latency + self.rng.uniform(-self.jitter, self.jitter), 0))
+        roll = self.rng.random()
+        if roll < self.quota_rate:
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        if roll < self.quota_rate + self.failure_rate:
+            raise RuntimeError("500 Fake model failure")
+        if "JSON array" in prompt:
+            return FakeResponse(json.dumps([
+                {"title": f"Fake Insight {i}", "content": "Generated by the fake model backend.",
+                 "sentiment": "neutral", "confidence": 0.5}
+                for i in range(1, 4)
+            ]))
+        term = re.search(r"term '([^']*)'", prompt)
+        return FakeResponse(f"{term.group(1) if term else 'This'} is explained here by the fake model backend.")
+
+    @classmethod
+    def from_env(cls) -> "FakeModel":
+        return cls(
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", 300)),
+            jitter_ms=float(os.getenv("FAKE_LLM_JITTER_MS", 200)),
+            failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", 0)),
+            quota_rate=float(os.getenv("FAKE_LLM_QUOTA_RATE", 0))
+        )
+
+llm_scheduler = LLMScheduler(gemini_gateway)
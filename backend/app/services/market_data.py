@@ -0,0 +1,205 @@
+import json
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+import pandas as pd
+import yfinance as yf
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OHLCV_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class MarketDataProvider(ABC):
+    """Source of prices and ticker metadata used by the stock service"""
+
+    name = "base"
+
+    @abstractmethod
+    def download_history(self, symbols: List[str], period: str = "5d", interval: str = "1d",
+                         start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """OHLCV bars for several symbols in one frame with (field, symbol) columns"""
+
+    @abstractmethod
+    def get_info(self, symbol: str) -> dict:
+        """Ticker metadata in yfinance `info` format (longName, sector, marketCap, ...)"""
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = "yfinance"
+
+    def download_history(self, symbols: List[str], period: str = "5d", interval: str = "1d",
+                         start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        if start or end:
+            hist = yf.download(
+                symbols, start=start, end=end, interval=interval, group_by="column",
+                auto_adjust=False, threads=True, progress=False
+            )
+        else:
+            hist = yf.download(
+                symbols, period=period, interval=interval, group_by="column",
+                auto_adjust=False, threads=True, progress=False
+            )
+        if not isinstance(hist.columns, pd.MultiIndex):
+            # yfinance drops the symbol level when only one ticker is requested
+            hist.columns = pd.MultiIndex.from_product([hist.columns, symbols])
+        return hist
+
+    def get_info(self, symbol: str) -> dict:
+        return yf.Ticker(symbol).info
+
+
+def period_to_timedelta(period: str) -> Optional[timedelta]:
+    if period in ("max", "ytd"):
+        return None
+    units = {"mo": 31, "wk": 7, "y": 366, "d": 1}
+    for suffix, days in units.items():
+        if period.endswith(suffix):
+            return timedelta(days=int(period[:-len(suffix)]) * days)
+    raise ValueError(f"Unsupported period: {period}")
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serves recorded bars and metadata from disk, for deterministic offline load tests
+
+    Layout of data_dir:
+        history/<interval>/<SYMBOL>.csv   Date,Open,High,Low,Close,Volume
+        info/<SYMBOL>.json                yfinance info dict
+
+    The replay clock starts `start_offset` bars before the end of the recording. With
+    `auto_advance` every quote download moves the clock one bar forward, so repeated
+    refreshes see prices change the way they did when the data was recorded.
+    """
+
+    name = "replay"
+
+    def __init__(self, data_dir: str, latency_ms: float = 0, jitter_ms: float = 0,
+                 start_offset: int = 0, auto_advance: bool = False, seed: int = 0):
+        self.data_dir = Path(data_dir)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.auto_advance = auto_advance
+        self.start_offset = start_offset
+        self._random = random.Random(seed)
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._advanced: Dict[str, int] = {}
+
+    def _sleep(self):
+        delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _load(self, symbol: str, interval: str) -> Optional[pd.DataFrame]:
+        key = f"{interval}/{symbol}"
+        if key not in self._frames:
+            path = self.data_dir / "history" / interval / f"{symbol}.csv"
+            if not path.exists():
+                return None
+            self._frames[key] = pd.read_csv(path, index_col=0, parse_dates=True).sort_index()
+        return self._frames[key]
+
+    def advance(self, steps: int = 1, interval: str = "1d"):
+        """Move the replay clock forward by `steps` bars"""
+        self._advanced[interval] = self._advanced.get(interval, 0) + steps
+
+    def _visible(self, frame: pd.DataFrame, interval: str) -> pd.DataFrame:
+        # Recordings of one interval share a calendar, so a bar count works as the clock
+        end = len(frame) - self.start_offset + self._advanced.get(interval, 0)
+        return frame.iloc[:max(min(end, len(frame)), 1)]
+
+    def download_history(self, symbols: List[str], period: str = "5d", interval: str = "1d",
+                         start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        self._sleep()
+        frames = {}
+        for symbol in symbols:
+            frame = self._load(symbol, interval)
+            if frame is None:
+                continue
+            frame = self._visible(frame, interval)
+            if start or end:
+                frame = frame.loc[start:end]
+            else:
+                window = period_to_timedelta(period)
+                if window is not None and len(frame):
+                    frame = frame[frame.index > frame.index[-1] - window]
+            frames[symbol] = frame.reindex(columns=OHLCV_FIELDS)
+
+        if self.auto_advance and not (start or end):
+            self.advance(interval=interval)
+
+        if not frames:
+            return pd.DataFrame(columns=pd.MultiIndex.from_product([OHLCV_FIELDS, symbols]))
+        hist = pd.concat(frames, axis=1)
+        # concat gives (symbol, field), the yfinance layout is (field, symbol)
+        return hist.swaplevel(axis=1).sort_index(axis=1)
+
+    def get_info(self, symbol: str) -> dict:
+        self._sleep()
+        path = self.data_dir / "info" / f"{symbol}.json"
+        if not path.exists():
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+
+class RecordingProvider(MarketDataProvider):
+    """Wraps another provider and writes everything it returns in ReplayProvider's layout"""
+
+    def __init__(self, inner: MarketDataProvider, data_dir: str):
+        self.inner = inner
+        self.name = f"{inner.name}+record"
+        self.data_dir = Path(data_dir)
+
+    def download_history(self, symbols: List[str], period: str = "5d", interval: str = "1d",
+                         start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        hist = self.inner.download_history(symbols, period=period, interval=interval, start=start, end=end)
+        history_dir = self.data_dir / "history" / interval
+        history_dir.mkdir(parents=True, exist_ok=True)
+        for symbol in hist.columns.get_level_values(1).unique():
+            frame = hist.xs(symbol, axis=1, level=1).reindex(columns=OHLCV_FIELDS).dropna(how="all")
+            path = history_dir / f"{symbol}.csv"
+            if path.exists():
+                existing = pd.read_csv(path, index_col=0, parse_dates=True)
+                frame = pd.concat([existing, frame])
+                frame = frame[~frame.index.duplicated(keep="last")]
+            frame.sort_index().to_csv(path)
+        return hist
+
+    def get_info(self, symbol: str) -> dict:
+        info = self.inner.get_info(symbol)
+        info_dir = self.data_dir / "info"
+        info_dir.mkdir(parents=True, exist_ok=True)
+        with open(info_dir / f"{symbol}.json", "w") as f:
+            json.dump(info, f, default=str)
+        return info
+
+
+def create_market_data_provider() -> MarketDataProvider:
+    """Build the provider selected by MARKET_DATA_PROVIDER (yfinance or replay)"""
+    backend = os.getenv("MARKET_DATA_PROVIDER", "yfinance").lower()
+    data_dir = os.getenv("MARKET_DATA_DIR", "market_data")
+
+    if backend == "replay":
+        provider = ReplayProvider(
+            data_dir,
+            latency_ms=float(os.getenv("MARKET_DATA_REPLAY_LATENCY_MS", 0)),
+            jitter_ms=float(os.getenv("MARKET_DATA_REPLAY_JITTER_MS", 0)),
+            start_offset=int(os.getenv("MARKET_DATA_REPLAY_START_OFFSET", 0)),
+            auto_advance=os.getenv("MARKET_DATA_REPLAY_AUTO_ADVANCE", "false").lower() == "true",
+            seed=int(os.getenv("MARKET_DATA_REPLAY_SEED", 0))
+        )
+    elif backend == "yfinance":
+        provider = YFinanceProvider()
+    else:
+        raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {backend}")
+
+    if os.getenv("MARKET_DATA_RECORD", "false").lower() == "true":
+        provider = RecordingProvider(provider, data_dir)
+    return provider
+
+market_data_provider = create_market_data_provider()
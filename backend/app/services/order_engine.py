@@ -0,0 +1,298 @@
+import heapq
+import os
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from ..database import AsyncSessionLocal
+from .scheduler import PeriodicJob
+from .trade_engine import TradeError, trade_engine
+
+load_dotenv()
+
+orders_table = models.Order.__table__
+transactions = models.Transaction.__table__
+
+ORDER_SIDES = ("buy", "sell")
+ORDER_TYPES = ("limit", "stop")
+TRIGGER_BATCH_SIZE = int(os.getenv("ORDER_TRIGGER_BATCH_SIZE", 500))
+
+# Which way the price has to move for an order to fire
+FALLS_TO = "falls_to"   # fires when price <= trigger: buy limit, sell stop
+RISES_TO = "rises_to"   # fires when price >= trigger: sell limit, buy stop
+
+
+def trigger_direction(side: str, order_type: str) -> str:
+    if (side, order_type) in (("buy", "limit"), ("sell", "stop")):
+        return FALLS_TO
+    return RISES_TO
+
+
+class TriggerIndex:
+    """Per-symbol heaps of resting order thresholds
+
+    For each symbol the orders that fire on a falling price sit in a max-heap and
+    the ones that fire on a rising price in a min-heap, so a tick only pops the
+    orders whose threshold was actually crossed: O(k log n) for k fired orders
+    instead of a scan over every open order. Cancellations are removed lazily.
+    """
+
+    def __init__(self):
+        self._falls: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        self._rises: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        self._live: Set[int] = set()
+
+    def __len__(self):
+        return len(self._live)
+
+    def __contains__(self, order_id: int):
+        return order_id in self._live
+
+    def add(self, order_id: int, symbol: str, direction: str, threshold: float):
+        if direction == FALLS_TO:
+            heapq.heappush(self._falls[symbol], (-threshold, order_id))
+        else:
+            heapq.heappush(self._rises[symbol], (threshold, order_id))
+        self._live.add(order_id)
+
+    def discard(self, order_id: int):
+        self._live.discard(order_id)
+
+    def crossed(self, symbol: str, price: float) -> List[int]:
+        """Pop and return the ids of live orders on symbol whose threshold price has crossed"""
+        fired = []
+        falls = self._falls.get(symbol)
+        while falls and -falls[0][0] >= price:
+            _, order_id = heapq.heappop(falls)
+            if order_id in self._live:
+                self._live.discard(order_id)
+                fired.append(order_id)
+        rises = self._rises.get(symbol)
+        while rises and rises[0][0] <= price:
+            _, order_id = heapq.heappop(rises)
+            if order_id in self._live:
+                self._live.discard(order_id)
+                fired.append(order_id)
+        return fired
+
+
+class OrderEngine:
+    """Keeps resting limit/stop orders in a TriggerIndex and executes them as prices move"""
+
+    def __init__(self):
+        self.index = TriggerIndex()
+        self._last_seen_id = 0
+        # A triggered order older than this with no outcome was abandoned by a failed or dead worker
+        self.trigger_timeout = float(os.getenv("ORDER_TRIGGER_TIMEOUT_SECONDS", 300))
+        self.job = PeriodicJob(
+            "order-resync",
+            float(os.getenv("ORDER_RESYNC_SECONDS", 60)),
+            self.resync
+        )
+
+    def start(self):
+        self.job.start()
+
+    async def stop(self):
+        await self.job.stop()
+
+    def _index_orders(self, rows):
+        for row in rows:
+            self.index.add(row.id, row.symbol, trigger_direction(row.side, row.order_type), row.trigger_price)
+            self._last_seen_id = max(self._last_seen_id, row.id)
+
+    async def sync(self, db: AsyncSession):
+        """Pick up open orders placed since the last sync (e.g. by another worker)"""
+        result = await db.execute(
+            select(orders_table.c.id, orders_table.c.symbol, orders_table.c.side,
+                   orders_table.c.order_type, orders_table.c.trigger_price).where(
+                orders_table.c.status == "open",
+                orders_table.c.id > self._last_seen_id
+            )
+        )
+        self._index_orders(result.all())
+
+    async def full_sync(self, db: AsyncSession):
+        """Index every open order the index is missing
+
+        Ids are handed out before commit, so another worker's order can become
+        visible after a higher id was already seen; the high-water mark in sync()
+        would skip it forever.
+        """
+        result = await db.execute(
+            select(orders_table.c.id, orders_table.c.symbol, orders_table.c.side,
+                   orders_table.c.order_type, orders_table.c.trigger_price).where(
+                orders_table.c.status == "open"
+            )
+        )
+        self._index_orders([row for row in result.all() if row.id not in self.index])
+
+    async def recover_triggered(self, db: AsyncSession):
+        """Settle orders left 'triggered' by a crash between the claim and the outcome write
+
+        The trade commits before the outcome, so an unclaimed transaction of the
+        same user, symbol, side and quantity made after the trigger means the
+        order filled; otherwise it goes back to open.
+        """
+        result = await db.execute(
+            select(orders_table.c.id, orders_table.c.user_id, orders_table.c.symbol, orders_table.c.side,
+                   orders_table.c.quantity, orders_table.c.triggered_at).where(
+                orders_table.c.status == "triggered",
+                orders_table.c.triggered_at < func.now() - timedelta(seconds=self.trigger_timeout)
+            ).order_by(orders_table.c.id)
+        )
+        for order in result.all():
+            claimed_transactions = select(orders_table.c.transaction_id).where(
+                orders_table.c.transaction_id.isnot(None)
+            )
+            match = await db.execute(
+                select(transactions.c.id).where(
+                    transactions.c.user_id == order.user_id,
+                    transactions.c.symbol == order.symbol,
+                    transactions.c.type == order.side,
+                    transactions.c.quantity == order.quantity,
+                    transactions.c.created_at >= order.triggered_at,
+                    transactions.c.id.notin_(claimed_transactions)
+                ).order_by(transactions.c.id).limit(1)
+            )
+            transaction_id = match.scalar_one_or_none()
+            values = {"status": "filled", "transaction_id": transaction_id} if transaction_id is not None \
+                else {"status": "open", "triggered_at": None}
+            await db.execute(
+                update(orders_table).where(
+                    orders_table.c.id == order.id,
+                    orders_table.c.status == "triggered"
+                ).values(**values)
+            )
+            await db.commit()
+
+    async def resync(self):
+        async with AsyncSessionLocal() as db:
+            await self.recover_triggered(db)
+            await self.full_sync(db)
+
+    async def place(self, db: AsyncSession, user_id: int, order: dict) -> models.Order:
+        side = order["side"]
+        order_type = order["order_type"]
+        if side not in ORDER_SIDES:
+            raise TradeError("Invalid order side")
+        if order_type not in ORDER_TYPES:
+            raise TradeError("Invalid order type")
+        if order["quantity"] <= 0:
+            raise TradeError("Quantity must be positive")
+        if order["trigger_price"] <= 0:
+            raise TradeError("Trigger price must be positive")
+
+        symbol = order["symbol"].upper()
+        result = await db.execute(select(models.Stock.current_price).where(models.Stock.symbol == symbol))
+        price = result.scalar_one_or_none()
+        if price is None:
+            raise TradeError("Stock not found", status_code=404)
+
+        db_order = models.Order(
+            user_id=user_id,
+            symbol=symbol,
+            side=side,
+            order_type=order_type,
+            quantity=order["quantity"],
+            trigger_price=order["trigger_price"]
+        )
+        db.add(db_order)
+        await db.commit()
+        await db.refresh(db_order)
+        self._index_orders([db_order])
+
+        # An order that is already marketable fires right away instead of waiting for the next tick
+        await self.execute_triggered(db, self.index.crossed(symbol, price))
+        await db.refresh(db_order)
+        return db_order
+
+    async def cancel(self, db: AsyncSession, user_id: int, order_id: int) -> bool:
+        result = await db.execute(
+            update(orders_table).where(
+                orders_table.c.id == order_id,
+                orders_table.c.user_id == user_id,
+                orders_table.c.status == "open"
+            ).values(status="cancelled").returning(orders_table.c.id)
+        )
+        cancelled = result.scalar_one_or_none() is not None
+        await db.commit()
+        if cancelled:
+            self.index.discard(order_id)
+        return cancelled
+
+    async def on_prices_changed(self, db: AsyncSession, symbols: Iterable[str]):
+        await self.sync(db)
+        result = await db.execute(
+            select(models.Stock.symbol, models.Stock.current_price).where(models.Stock.symbol.in_(list(symbols)))
+        )
+        fired = []
+        for symbol, price in result.all():
+            if price is not None:
+                fired.extend(self.index.crossed(symbol, price))
+        for start in range(0, len(fired), TRIGGER_BATCH_SIZE):
+            await self.execute_triggered(db, fired[start:start + TRIGGER_BATCH_SIZE])
+
+    async def execute_triggered(self, db: AsyncSession, order_ids: List[int]):
+        """Claim fired orders and run them through the trade engine, one batch per user
+
+        Orders execute at the current market price. The claim (open -> triggered)
+        is atomic, so an order cancelled meanwhile, or claimed by another worker,
+        is skipped.
+        """
+        if not order_ids:
+            return
+        result = await db.execute(
+            update(orders_table).where(
+                orders_table.c.id.in_(order_ids),
+                orders_table.c.status == "open"
+            ).values(status="triggered", triggered_at=func.now()).returning(
+                orders_table.c.id, orders_table.c.user_id, orders_table.c.symbol,
+                orders_table.c.side, orders_table.c.quantity
+            )
+        )
+        claimed = result.all()
+        await db.commit()
+
+        by_user = defaultdict(list)
+        for row in sorted(claimed, key=lambda row: row.id):
+            by_user[row.user_id].append(row)
+
+        outcomes = []
+        for user_id, rows in by_user.items():
+            try:
+                batch = await trade_engine.execute_batch(
+                    db, user_id,
+                    [{"symbol": row.symbol, "type": row.side, "quantity": row.quantity} for row in rows],
+                    mode="best_effort"
+                )
+            except Exception as e:
+                await db.rollback()
+                print(f"Error executing triggered orders for user {user_id}: {e}")
+                outcomes.extend({"order_id": row.id, "status": "rejected", "transaction_id": None,
+                                 "error": "Execution failed"} for row in rows)
+                continue
+            for row, outcome in zip(rows, batch["results"]):
+                executed = outcome["status"] == "executed"
+                outcomes.append({
+                    "order_id": row.id,
+                    "status": "filled" if executed else "rejected",
+                    "transaction_id": outcome.get("transaction_id"),
+                    "error": outcome.get("error")
+                })
+
+        if outcomes:
+            await db.execute(
+                update(orders_table).where(orders_table.c.id == bindparam("order_id")).values(
+                    status=bindparam("status"),
+                    transaction_id=bindparam("transaction_id"),
+                    error=bindparam("error")
+                ),
+                outcomes
+            )
+            await db.commit()
+
+order_engine = OrderEngine()
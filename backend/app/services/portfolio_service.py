@@ -0,0 +1,64 @@
+import os
+from typing import Iterable, List, Set
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+
+MARK_TO_MARKET_CHUNK_SIZE = int(os.getenv("MARK_TO_MARKET_CHUNK_SIZE", 1000))
+
+
+async def get_holdings(db: AsyncSession, user_id: int) -> List[dict]:
+    """A user's holdings valued at the latest quote, in one join and without writing anything"""
+    live_price = func.coalesce(models.Stock.current_price, models.Portfolio.current_price)
+    result = await db.execute(
+        select(models.Portfolio, live_price).outerjoin(
+            models.Stock, models.Stock.symbol == models.Portfolio.symbol
+        ).filter(models.Portfolio.user_id == user_id).order_by(models.Portfolio.symbol)
+    )
+    
+    holdings = []
+    for holding, current_price in result.all():
+        current_price = current_price or 0.0
+        market_value = current_price * holding.quantity
+        cost_basis = holding.avg_price * holding.quantity
+        total_pnl = market_value - cost_basis
+        holdings.append({
+            "id": holding.id,
+            "user_id": holding.user_id,
+            "symbol": holding.symbol,
+            "quantity": holding.quantity,
+            "avg_price": holding.avg_price,
+            "current_price": current_price,
+            "market_value": market_value,
+            "total_pnl": total_pnl,
+            "total_pnl_percentage": (total_pnl / cost_basis * 100) if cost_basis > 0 else 0,
+            "created_at": holding.created_at,
+            "updated_at": holding.updated_at,
+            "valued_at": holding.valued_at
+        })
+    return holdings
+
+async def mark_to_market(db: AsyncSession, symbols: Iterable[str]) -> Set[int]:
+    """Copy the latest stock prices into every holding of symbols, one UPDATE .. FROM stocks per chunk
+
+    Returns the ids of users whose holdings were revalued.
+    """
+    symbols = sorted(symbols)
+    user_ids = set()
+    for start in range(0, len(symbols), MARK_TO_MARKET_CHUNK_SIZE):
+        chunk = symbols[start:start + MARK_TO_MARKET_CHUNK_SIZE]
+        result = await db.execute(
+            update(models.Portfolio).where(
+                models.Portfolio.symbol == models.Stock.symbol,
+                models.Stock.symbol.in_(chunk)
+            ).values(
+                current_price=models.Stock.current_price,
+                valued_at=models.Stock.updated_at
+            ).returning(models.Portfolio.user_id)
+        )
+        user_ids.update(result.scalars().all())
+    await db.commit()
+    return user_ids
+
+async def on_prices_changed(db: AsyncSession, symbols: Iterable[str]):
+    await mark_to_market(db, symbols)
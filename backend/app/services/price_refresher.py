@@ -0,0 +1,118 @@
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from dotenv import load_dotenv
+from sqlalchemy import select
+from .. import models
+from ..database import AsyncSessionLocal
+from .scheduler import PeriodicJob
+from .stock_service import stock_service
+
+load_dotenv()
+
+
+def _parse_symbol_ttls(raw: str) -> Dict[str, float]:
+    """Parse "TSLA:15,COIN:15" into a per-symbol TTL map"""
+    ttls = {}
+    for item in raw.split(","):
+        if ":" not in item:
+            continue
+        symbol, ttl = item.split(":", 1)
+        try:
+            ttls[symbol.strip().upper()] = float(ttl)
+        except ValueError:
+            print(f"Ignoring invalid price TTL for {symbol}: {ttl}")
+    return ttls
+
+
+class PriceRefresher:
+    """Keeps the stocks table fresh in the background so requests never wait on yfinance"""
+
+    def __init__(self):
+        self.interval = float(os.getenv("PRICE_REFRESH_INTERVAL_SECONDS", 15))
+        self.default_ttl = float(os.getenv("PRICE_STALE_TTL_SECONDS", 60))
+        self.symbol_ttls = _parse_symbol_ttls(os.getenv("PRICE_SYMBOL_TTLS", ""))
+        self.tracked: Set[str] = set(stock_service.default_stocks)
+        self.last_refreshed: Dict[str, datetime] = {}
+        self.last_run_at: Optional[datetime] = None
+        self.listeners: List[Callable[[object, Set[str]], Awaitable[None]]] = []
+        self.job = PeriodicJob("price-refresher", self.interval, self.refresh_stale)
+
+    def start(self):
+        self.job.start()
+
+    async def stop(self):
+        await self.job.stop()
+
+    def add_listener(self, listener: Callable[[object, Set[str]], Awaitable[None]]):
+        """Register a coroutine called with (db, changed_symbols) after each refresh that moved prices"""
+        self.listeners.append(listener)
+
+    def ttl_for(self, symbol: str) -> float:
+        return self.symbol_ttls.get(symbol, self.default_ttl)
+
+    def track(self, symbols: Iterable[str]):
+        """Add symbols to the refresh universe (picked up on the next tick)"""
+        for symbol in symbols:
+            self.tracked.add(symbol.upper())
+
+    def is_stale(self, symbol: str, now: Optional[datetime] = None) -> bool:
+        last = self.last_refreshed.get(symbol)
+        if last is None:
+            return True
+        now = now or datetime.utcnow()
+        return now - last >= timedelta(seconds=self.ttl_for(symbol))
+
+    def stale_symbols(self) -> List[str]:
+        now = datetime.utcnow()
+        return sorted(symbol for symbol in self.tracked if self.is_stale(symbol, now))
+
+    async def refresh_stale(self):
+        symbols = self.stale_symbols()
+        if not symbols:
+            return
+        async with AsyncSessionLocal() as db:
+            await self.refresh(db, symbols)
+
+    async def refresh(self, db, symbols: List[str]) -> Optional[Set[str]]:
+        changed = await stock_service.update_stock_prices(db, symbols)
+        if changed is None:
+            return None
+        
+        now = datetime.utcnow()
+        for symbol in symbols:
+            self.last_refreshed[symbol] = now
+        self.last_run_at = now
+        
+        if changed:
+            for listener in self.listeners:
+                try:
+                    await listener(db, changed)
+                except Exception as e:
+                    print(f"Error in price refresh listener {getattr(listener, '__name__', listener)}: {e}")
+                    await db.rollback()
+        return changed
+
+    async def get_quote(self, symbol: str) -> Optional[dict]:
+        """Cached quote for symbol; concurrent misses share a single load"""
+        return await stock_service.quote_cache.get_or_load(symbol, lambda: self._load_quote(symbol))
+
+    async def _stock_row(self, db, symbol: str) -> Optional[models.Stock]:
+        result = await db.execute(select(models.Stock).filter(models.Stock.symbol == symbol))
+        return result.scalar_one_or_none()
+
+    async def _load_quote(self, symbol: str) -> Optional[dict]:
+        """Serve the stocks row, which the background refresh keeps fresh
+
+        Only a symbol the table has never seen goes upstream inline, as a bare
+        fetch + upsert: the listener chain runs on the next background tick.
+        """
+        async with AsyncSessionLocal() as db:
+            stock = await self._stock_row(db, symbol)
+            if stock is None:
+                if await stock_service.update_stock_prices(db, [symbol]) is not None:
+                    self.last_refreshed[symbol] = datetime.utcnow()
+                stock = await self._stock_row(db, symbol)
+            return stock_service.quote(stock) if stock else None
+
+price_refresher = PriceRefresher()
@@ -0,0 +1,133 @@
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from ..database import AsyncSessionLocal
+from .cache import AsyncTTLCache
+
+load_dotenv()
+
+market_data = models.MarketData.__table__
+
+TRADING_DAYS = 252
+VAR_CONFIDENCE = 0.95
+VAR_Z = 1.6449  # one-sided 95% normal quantile
+# Annualized volatility at which risk_score saturates at 1.0
+MAX_SCORED_VOLATILITY = 0.6
+
+
+class RiskModel:
+    """Universe-wide daily return statistics, built once and shared by every user's analysis"""
+
+    def __init__(self, returns: pd.DataFrame, benchmark: Optional[str]):
+        self.symbols: List[str] = list(returns.columns)
+        self.position = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.as_of = returns.index[-1] if len(returns) else None
+        # Missing days contribute nothing rather than knocking out whole rows
+        self.returns = returns.fillna(0.0).to_numpy()
+        self.mean = self.returns.mean(axis=0)
+        self.covariance = returns.cov(min_periods=2).fillna(0.0).to_numpy()
+        self.volatility = np.sqrt(np.diag(self.covariance))
+
+        if benchmark in self.position:
+            market = self.returns[:, self.position[benchmark]]
+        else:
+            # No benchmark series ingested: use the equal-weighted universe as the market
+            market = self.returns.mean(axis=1)
+        market_var = market.var(ddof=1) if len(market) > 1 else 0.0
+        if market_var > 0:
+            centered = self.returns - self.returns.mean(axis=0)
+            self.beta = centered.T @ (market - market.mean()) / (len(market) - 1) / market_var
+        else:
+            self.beta = np.zeros(len(self.symbols))
+
+    def portfolio(self, values: Dict[str, float]) -> Optional[dict]:
+        """Risk of a portfolio given market value per symbol; only held columns are touched"""
+        covered = {symbol: value for symbol, value in values.items() if symbol in self.position and value > 0}
+        total = sum(covered.values())
+        if total <= 0:
+            return None
+
+        idx = np.array([self.position[symbol] for symbol in covered])
+        w = np.array(list(covered.values())) / total
+        sigma = self.covariance[np.ix_(idx, idx)]
+
+        daily_vol = math.sqrt(max(float(w @ sigma @ w), 0.0))
+        weighted_vol = float(w @ self.volatility[idx])
+        daily_mean = float(w @ self.mean[idx])
+        portfolio_returns = self.returns[:, idx] @ w
+
+        historical_var = -float(np.percentile(portfolio_returns, (1 - VAR_CONFIDENCE) * 100)) \
+            if len(portfolio_returns) else 0.0
+        parametric_var = VAR_Z * daily_vol - daily_mean
+        annual_vol = daily_vol * math.sqrt(TRADING_DAYS)
+
+        return {
+            "volatility": annual_vol,
+            "beta": float(w @ self.beta[idx]),
+            # 1-day 95% VaR as a fraction of the covered value
+            "var_95_historical": max(historical_var, 0.0),
+            "var_95_parametric": max(parametric_var, 0.0),
+            # 0 for one holding or perfectly correlated ones, towards 1 the more correlations cancel out
+            "diversification_score": 1 - daily_vol / weighted_vol if weighted_vol > 0 else 0.0,
+            "risk_score": min(annual_vol / MAX_SCORED_VOLATILITY, 1.0),
+            "coverage": total / sum(v for v in values.values() if v > 0)
+        }
+
+
+class RiskService:
+    """Builds the shared RiskModel from market_data and evaluates portfolios against it"""
+
+    def __init__(self):
+        self.lookback_days = int(os.getenv("RISK_LOOKBACK_DAYS", 365))
+        self.min_observations = int(os.getenv("RISK_MIN_OBSERVATIONS", 30))
+        self.benchmark = os.getenv("RISK_BENCHMARK", "SPY")
+        # One entry; dropped whenever ingestion writes new bars so it is rebuilt once per refresh
+        self.cache = AsyncTTLCache(
+            "risk-model",
+            ttl_seconds=float(os.getenv("RISK_MODEL_TTL_SECONDS", 6 * 3600)),
+            max_entries=1
+        )
+
+    async def model(self) -> RiskModel:
+        return await self.cache.get_or_load("universe", self._load)
+
+    async def _load(self) -> RiskModel:
+        # Every request waiting on "universe" shares this build, so it can't use one of their sessions
+        async with AsyncSessionLocal() as db:
+            return await self._build(db)
+
+    async def _build(self, db: AsyncSession) -> RiskModel:
+        start = datetime.now(timezone.utc) - timedelta(days=self.lookback_days)
+        result = await db.execute(
+            select(market_data.c.date, market_data.c.symbol, market_data.c.close_price).where(
+                market_data.c.interval == "1d",
+                market_data.c.date >= start
+            )
+        )
+        bars = pd.DataFrame(result.all(), columns=["date", "symbol", "close"])
+        if bars.empty:
+            return RiskModel(pd.DataFrame(), self.benchmark)
+
+        closes = bars.pivot(index="date", columns="symbol", values="close").sort_index().ffill()
+        returns = closes.pct_change(fill_method=None).iloc[1:]
+        returns = returns.loc[:, returns.count() >= self.min_observations]
+        return RiskModel(returns, self.benchmark)
+
+    async def on_bars(self, rows: Iterable[dict]):
+        if any(row["interval"] == "1d" for row in rows):
+            self.cache.clear()
+
+    async def analyze(self, holdings: List[dict]) -> Optional[dict]:
+        values = {}
+        for holding in holdings:
+            values[holding["symbol"]] = values.get(holding["symbol"], 0.0) + holding["market_value"]
+        return (await self.model()).portfolio(values)
+
+risk_service = RiskService()
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+
+class PeriodicJob:
+    """Run an async callable on a fixed interval in the background"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable[None]],
+                 run_immediately: bool = True):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_immediately = run_immediately
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def trigger(self):
+        """Run the job now instead of waiting for the next tick"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self):
+        if not self.run_immediately:
+            await self._sleep()
+        while True:
+            try:
+                await self.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in background job {self.name}: {e}")
+            await self._sleep()
+
+    async def _sleep(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
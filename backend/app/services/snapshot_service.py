@@ -0,0 +1,107 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import case, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from ..database import AsyncSessionLocal
+from .scheduler import PeriodicJob
+
+load_dotenv()
+
+snapshots = models.PortfolioSnapshot.__table__
+leaderboard = models.LeaderboardEntry.__table__
+
+# Baseline for each period: the latest snapshot on or before today minus this many days
+PERIOD_DAYS = {"day": 1, "week": 7, "month": 30}
+
+
+class SnapshotService:
+    """Writes one snapshot row per user per day and derives the leaderboard period returns from them
+
+    The job runs several times a day and upserts today's row, so the last run
+    after the close leaves the end-of-day values and a restart never skips a day.
+    """
+
+    def __init__(self):
+        self.job = PeriodicJob(
+            "portfolio-snapshots",
+            float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", 3600)),
+            self.snapshot_all
+        )
+
+    def start(self):
+        self.job.start()
+
+    async def stop(self):
+        await self.job.stop()
+
+    async def write_snapshots(self, db: AsyncSession, snapshot_date: date):
+        """One INSERT .. SELECT over users and their aggregated holdings, upserting today's rows"""
+        holdings = select(
+            models.Portfolio.user_id,
+            func.sum(models.Portfolio.current_price * models.Portfolio.quantity).label("market_value"),
+            func.sum(models.Portfolio.avg_price * models.Portfolio.quantity).label("invested")
+        ).group_by(models.Portfolio.user_id).subquery()
+        market_value = func.coalesce(holdings.c.market_value, 0)
+
+        stmt = pg_insert(snapshots).from_select(
+            ["user_id", "snapshot_date", "cash", "market_value", "total_value", "total_pnl"],
+            select(
+                models.User.id,
+                literal(snapshot_date),
+                models.User.balance,
+                market_value,
+                models.User.balance + market_value,
+                market_value - func.coalesce(holdings.c.invested, 0)
+            ).outerjoin(holdings, holdings.c.user_id == models.User.id)
+        )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[snapshots.c.user_id, snapshots.c.snapshot_date],
+            set_={
+                "cash": stmt.excluded.cash,
+                "market_value": stmt.excluded.market_value,
+                "total_value": stmt.excluded.total_value,
+                "total_pnl": stmt.excluded.total_pnl,
+                "created_at": func.now()
+            }
+        ))
+
+    async def update_period_returns(self, db: AsyncSession, snapshot_date: date):
+        """Store day/week/month returns on the leaderboard rows so period top-N is an index scan"""
+        current = select(snapshots.c.user_id, snapshots.c.total_value).where(
+            snapshots.c.snapshot_date == snapshot_date
+        ).subquery()
+
+        returns = select(current.c.user_id).select_from(current)
+        for period, days in PERIOD_DAYS.items():
+            # Latest snapshot per user on or before the cutoff, walking the primary key
+            base = select(snapshots.c.user_id, snapshots.c.total_value).distinct(snapshots.c.user_id).where(
+                snapshots.c.snapshot_date <= snapshot_date - timedelta(days=days)
+            ).order_by(snapshots.c.user_id, snapshots.c.snapshot_date.desc()).subquery(period)
+            returns = returns.outerjoin(base, base.c.user_id == current.c.user_id).add_columns(
+                case(
+                    (base.c.total_value > 0, (current.c.total_value - base.c.total_value) / base.c.total_value * 100),
+                    else_=None
+                ).label(f"{period}_return")
+            )
+        returns = returns.subquery()
+
+        await db.execute(
+            update(leaderboard).where(leaderboard.c.user_id == returns.c.user_id).values(
+                day_return=returns.c.day_return,
+                week_return=returns.c.week_return,
+                month_return=returns.c.month_return
+            )
+        )
+
+    async def snapshot_all(self, snapshot_date: Optional[date] = None):
+        snapshot_date = snapshot_date or datetime.now(timezone.utc).date()
+        async with AsyncSessionLocal() as db:
+            await self.write_snapshots(db, snapshot_date)
+            await self.update_period_returns(db, snapshot_date)
+            await db.commit()
+
+snapshot_service = SnapshotService()
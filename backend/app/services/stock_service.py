@@ -1,95 +1,211 @@
-import yfinance as yf
+import asyncio
+import os
 import pandas as pd
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from .. import models, schemas
 from datetime import datetime, timedelta
+from .market_data import MarketDataProvider, market_data_provider
+from .cache import AsyncTTLCache
+from .blocking import market_data_gateway
+
+class MetadataCache:
+    """Long-TTL cache for slow-changing ticker info (name, sector, market cap)"""
+
+    def __init__(self, ttl_seconds: float, fetch_info: Callable[[str], dict], failure_ttl_seconds: float = 300):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        # Failed lookups (429s, timeouts) are retried soon instead of serving defaults for a day
+        self.failure_ttl = timedelta(seconds=failure_ttl_seconds)
+        self.fetch_info = fetch_info
+        self._entries: Dict[str, Tuple[datetime, dict]] = {}
+
+    def get(self, symbol: str) -> Optional[dict]:
+        entry = self._entries.get(symbol)
+        if entry and datetime.utcnow() < entry[0]:
+            return entry[1]
+        return None
+
+    def set(self, symbol: str, info: dict, ttl: Optional[timedelta] = None):
+        self._entries[symbol] = (datetime.utcnow() + (ttl or self.ttl), {
+            "name": info.get('longName', symbol),
+            "sector": info.get('sector', 'Unknown'),
+            "market_cap": info.get('marketCap', 0)
+        })
+
+    async def _fetch(self, symbol: str):
+        try:
+            self.set(symbol, await market_data_gateway.run(self.fetch_info, symbol))
+        except Exception as e:
+            print(f"Error fetching metadata for {symbol}: {e}")
+            self.set(symbol, {}, self.failure_ttl)
+
+    async def get_many(self, symbols: List[str]) -> Dict[str, dict]:
+        missing = [symbol for symbol in symbols if self.get(symbol) is None]
+        if missing:
+            await asyncio.gather(*(self._fetch(symbol) for symbol in missing))
+        return {symbol: self.get(symbol) for symbol in symbols}
 
 class StockService:
-    def __init__(self):
+    def __init__(self, provider: Optional[MarketDataProvider] = None):
+        self.provider = provider or market_data_provider
         self.default_stocks = [
             "AAPL", "GOOGL", "MSFT", "AMZN", "TSLA", "META", "NVDA", "NFLX", 
             "AMD", "INTC", "CRM", "ORCL", "ADBE", "PYPL", "UBER", "SPOT",
             "COIN", "ROKU", "ZM", "DIS"
         ]
+        self.batch_size = int(os.getenv("PRICE_BATCH_SIZE", 200))
+        self.metadata_cache = MetadataCache(
+            float(os.getenv("STOCK_METADATA_TTL_SECONDS", 86400)),
+            lambda symbol: self.provider.get_info(symbol),
+            float(os.getenv("STOCK_METADATA_FAILURE_TTL_SECONDS", 300))
+        )
+        # 1000 rows x 8 columns stays well under the 32767 bind parameter limit of asyncpg
+        self.upsert_chunk_size = int(os.getenv("STOCK_UPSERT_CHUNK_SIZE", 1000))
+        # Latest quote per symbol, refilled by every refresh so ticker pages rarely go upstream
+        self.quote_cache = AsyncTTLCache(
+            "quotes",
+            ttl_seconds=float(os.getenv("QUOTE_CACHE_TTL_SECONDS", 90)),
+            max_entries=int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", 5000))
+        )
+    
+    @staticmethod
+    def compute_quotes(hist: pd.DataFrame) -> pd.DataFrame:
+        """Vectorized last close, change, change % and volume for every symbol in a history frame"""
+        close = hist['Close']
+        volume = hist['Volume']
+        valid = close.notna()
+        # Number of valid closes at or after each row, per symbol: 1 marks the latest, 2 the previous one
+        remaining = valid.iloc[::-1].cumsum().iloc[::-1]
+        last_mask = valid & (remaining == 1)
+        prev_mask = valid & (remaining == 2)
+        
+        current_price = close.where(last_mask).max()
+        prev_price = close.where(prev_mask).max()
+        last_volume = volume.where(last_mask).max().fillna(0)
+        
+        quotes = pd.DataFrame({
+            "current_price": current_price,
+            "change": current_price - prev_price,
+            "change_percent": (current_price - prev_price) / prev_price * 100,
+            "volume": last_volume
+        })
+        quotes.index.name = "symbol"
+        return quotes.dropna(subset=["current_price", "change"])
+    
+    async def fetch_quotes(self, symbols: List[str]) -> pd.DataFrame:
+        """Fetch quotes in batches of batch_size, one download per batch, batches run concurrently"""
+        batches = [symbols[start:start + self.batch_size] for start in range(0, len(symbols), self.batch_size)]
+        results = await asyncio.gather(
+            *(market_data_gateway.run(self.provider.download_history, batch, period="5d") for batch in batches),
+            return_exceptions=True
+        )
+        frames = []
+        for batch, hist in zip(batches, results):
+            if isinstance(hist, Exception):
+                print(f"Error downloading batch {batch[0]}..{batch[-1]}: {hist}")
+                continue
+            frames.append(self.compute_quotes(hist))
+        if not frames:
+            return pd.DataFrame(columns=["current_price", "change", "change_percent", "volume"])
+        quotes = pd.concat(frames)
+        missing = set(symbols) - set(quotes.index)
+        for symbol in sorted(missing):
+            print(f"Skipping {symbol}: insufficient price data (possibly delisted)")
+        return quotes
+    
+    @staticmethod
+    def quote(stock) -> dict:
+        """Quote dict in schemas.Stock shape from a stocks row or ORM object"""
+        return {
+            "id": stock.id,
+            "symbol": stock.symbol,
+            "name": stock.name,
+            "current_price": stock.current_price,
+            "change": stock.change,
+            "change_percent": stock.change_percent,
+            "volume": stock.volume,
+            "market_cap": stock.market_cap,
+            "sector": stock.sector,
+            "updated_at": stock.updated_at
+        }
     
-    async def update_stock_prices(self, db: AsyncSession, symbols: Optional[List[str]] = None):
+    async def upsert_quotes(self, db: AsyncSession, rows: List[dict]) -> Set[str]:
+        """Write quote rows with one INSERT .. ON CONFLICT per chunk, returning symbols whose price moved
+
+        The stored rows (with any preserved metadata) refill the quote cache.
+        """
+        stocks = models.Stock.__table__
+        changed = set()
+        stored = []
+        
+        for start in range(0, len(rows), self.upsert_chunk_size):
+            chunk = rows[start:start + self.upsert_chunk_size]
+            symbols = [row["symbol"] for row in chunk]
+            
+            # Both CTEs see the same snapshot, so "previous" holds the prices from before the upsert
+            previous = select(stocks.c.symbol, stocks.c.current_price).where(
+                stocks.c.symbol.in_(symbols)
+            ).cte("previous")
+            insert_stmt = pg_insert(stocks).values(chunk)
+            upserted = insert_stmt.on_conflict_do_update(
+                index_elements=[stocks.c.symbol],
+                set_={
+                    # MetadataCache defaults (symbol as name, 'Unknown', 0) never overwrite real metadata
+                    "name": func.coalesce(func.nullif(insert_stmt.excluded.name, insert_stmt.excluded.symbol), stocks.c.name),
+                    "current_price": insert_stmt.excluded.current_price,
+                    "change": insert_stmt.excluded.change,
+                    "change_percent": insert_stmt.excluded.change_percent,
+                    "volume": insert_stmt.excluded.volume,
+                    "market_cap": func.coalesce(func.nullif(insert_stmt.excluded.market_cap, 0), stocks.c.market_cap),
+                    "sector": func.coalesce(func.nullif(insert_stmt.excluded.sector, "Unknown"), stocks.c.sector),
+                    "updated_at": func.now()
+                }
+            ).returning(*stocks.c).cte("upserted")
+            
+            result = await db.execute(
+                select(
+                    upserted,
+                    previous.c.current_price.is_distinct_from(upserted.c.current_price).label("moved")
+                ).select_from(upserted.outerjoin(previous, previous.c.symbol == upserted.c.symbol))
+            )
+            for row in result.all():
+                stored.append(self.quote(row))
+                if row.moved:
+                    changed.add(row.symbol)
+        
+        await db.commit()
+        for quote in stored:
+            self.quote_cache.set(quote["symbol"], quote)
+        return changed
+    
+    async def update_stock_prices(self, db: AsyncSession, symbols: Optional[List[str]] = None) -> Optional[Set[str]]:
+        """Refresh quotes for symbols, returning the symbols whose price changed (None on failure)"""
         if not symbols:
             symbols = self.default_stocks
         
         try:
-            tickers = yf.Tickers(' '.join(symbols))
+            quotes = await self.fetch_quotes(symbols)
+            metadata = await self.metadata_cache.get_many(list(quotes.index))
             
-            for symbol in symbols:
-                try:
-                    ticker = tickers.tickers[symbol]
-                    info = ticker.info
-                    hist = ticker.history(period="2d")
-                    
-                    if len(hist) < 2:
-                        print(f"Skipping {symbol}: insufficient price data (possibly delisted)")
-                        continue
-                    
-                    current_price = hist['Close'].iloc[-1]
-                    prev_price = hist['Close'].iloc[-2]
-                    change = current_price - prev_price
-                    change_percent = (change / prev_price) * 100
-                    
-                    result = await db.execute(select(models.Stock).filter(models.Stock.symbol == symbol))
-                    db_stock = result.scalar_one_or_none()
-                    
-                    if db_stock:
-                        db_stock.current_price = float(current_price)
-                        db_stock.change = float(change)
-                        db_stock.change_percent = float(change_percent)
-                        db_stock.volume = int(hist['Volume'].iloc[-1]) if not pd.isna(hist['Volume'].iloc[-1]) else 0
-                        db_stock.market_cap = info.get('marketCap', 0)
-                        db_stock.sector = info.get('sector', 'Unknown')
-                        db_stock.updated_at = datetime.utcnow()
-                    else:
-                        db_stock = models.Stock(
-                            symbol=symbol,
-                            name=info.get('longName', symbol),
-                            current_price=float(current_price),
-                            change=float(change),
-                            change_percent=float(change_percent),
-                            volume=int(hist['Volume'].iloc[-1]) if not pd.isna(hist['Volume'].iloc[-1]) else 0,
-                            market_cap=info.get('marketCap', 0),
-                            sector=info.get('sector', 'Unknown')
-                        )
-                        db.add(db_stock)
-                    
-                except Exception as e:
-                    print(f"Error updating {symbol}: {e}")
-                    continue
-            
-            await db.commit()
-            return True
+            rows = [
+                {
+                    "symbol": symbol,
+                    "name": metadata[symbol]['name'],
+                    "current_price": float(quote['current_price']),
+                    "change": float(quote['change']),
+                    "change_percent": float(quote['change_percent']),
+                    "volume": int(quote['volume']),
+                    "market_cap": metadata[symbol]['market_cap'],
+                    "sector": metadata[symbol]['sector']
+                }
+                for symbol, quote in quotes.iterrows()
+            ]
+            return await self.upsert_quotes(db, rows)
         except Exception as e:
             print(f"Error updating stock prices: {e}")
-            return False
-    
-
-    
-    def search_stocks(self, query: str, limit: int = 10):
-        try:
-            ticker = yf.Ticker(query.upper())
-            info = ticker.info
-            
-            if 'longName' in info:
-                return [{
-                    "symbol": query.upper(),
-                    "name": info.get('longName', query.upper()),
-                    "current_price": info.get('currentPrice', 0),
-                    "change": 0,
-                    "change_percent": 0,
-                    "volume": info.get('volume', 0),
-                    "market_cap": info.get('marketCap', 0),
-                    "sector": info.get('sector', 'Unknown')
-                }]
-            return []
-        except:
-            return []
+            await db.rollback()
+            return None
 
 stock_service = StockService()
\ No newline at end of file
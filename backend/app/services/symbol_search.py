@@ -0,0 +1,226 @@
+import asyncio
+import csv
+import os
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import select
+from .. import models
+from ..database import AsyncSessionLocal
+from .scheduler import PeriodicJob
+
+load_dotenv()
+
+_TOKEN = re.compile(r"[A-Z0-9]+")
+
+# Match kinds, best first; the score is what ranking sorts on
+EXACT_SYMBOL, SYMBOL_PREFIX, EXACT_WORD, WORD_PREFIX, FUZZY_SYMBOL, FUZZY_WORD = 100, 80, 60, 50, 35, 25
+# Typo tolerance only kicks in for query tokens at least this long
+MIN_FUZZY_LENGTH = 4
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.upper())
+
+
+def _deletes(term: str) -> Set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Levenshtein distance <= 1, plus adjacent transpositions"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        return a[i + 1:] == b[i + 1:] or (
+            i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+        )
+    return a[i:] == b[i + 1:]
+
+
+class SymbolIndex:
+    """Immutable prefix + typo-tolerant index over (symbol, name) listings
+
+    Prefix lookups bisect sorted term lists; typos are found with a
+    symmetric-delete table (every term with one character removed), so a
+    lookup touches only a handful of dict buckets regardless of universe size.
+    """
+
+    def __init__(self, listings: Iterable[dict]):
+        self.listings: List[dict] = []
+        seen = set()
+        for listing in listings:
+            symbol = listing["symbol"].strip().upper()
+            if symbol and symbol not in seen:
+                seen.add(symbol)
+                self.listings.append({**listing, "symbol": symbol})
+
+        self.by_symbol: Dict[str, int] = {listing["symbol"]: i for i, listing in enumerate(self.listings)}
+        words: Dict[str, Set[int]] = defaultdict(set)
+        for i, listing in enumerate(self.listings):
+            for word in tokenize(listing.get("name") or ""):
+                words[word].add(i)
+        self.words = {word: sorted(ids) for word, ids in words.items()}
+
+        self.sorted_symbols = sorted(self.by_symbol)
+        self.sorted_words = sorted(self.words)
+        self.symbol_deletes = self._delete_table(self.sorted_symbols)
+        self.word_deletes = self._delete_table(self.sorted_words)
+
+    def __len__(self):
+        return len(self.listings)
+
+    @staticmethod
+    def _delete_table(terms: List[str]) -> Dict[str, List[str]]:
+        table = defaultdict(list)
+        for term in terms:
+            if len(term) >= MIN_FUZZY_LENGTH - 1:
+                table[term].append(term)
+                for variant in _deletes(term):
+                    table[variant].append(term)
+        return dict(table)
+
+    @staticmethod
+    def _prefixed(terms: List[str], prefix: str, limit: int) -> List[str]:
+        start = bisect_left(terms, prefix)
+        matches = []
+        for term in terms[start:start + limit]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    @staticmethod
+    def _fuzzy(table: Dict[str, List[str]], token: str) -> Set[str]:
+        if len(token) < MIN_FUZZY_LENGTH:
+            return set()
+        candidates = set()
+        for variant in _deletes(token) | {token}:
+            candidates.update(table.get(variant, ()))
+        return {term for term in candidates if term != token and _within_one_edit(term, token)}
+
+    def _token_scores(self, token: str, is_last: bool, fanout: int) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+
+        def offer(ids: Iterable[int], score: float):
+            for i in ids:
+                if score > scores.get(i, 0):
+                    scores[i] = score
+
+        if token in self.by_symbol:
+            offer([self.by_symbol[token]], EXACT_SYMBOL)
+        for symbol in self._prefixed(self.sorted_symbols, token, fanout):
+            # Shorter completions first: "AA" ranks AAL above AAPL
+            offer([self.by_symbol[symbol]], SYMBOL_PREFIX - (len(symbol) - len(token)))
+        offer(self.words.get(token, ()), EXACT_WORD)
+        if is_last:
+            # Only the word being typed is treated as a prefix
+            for word in self._prefixed(self.sorted_words, token, fanout):
+                offer(self.words[word], WORD_PREFIX - 0.5 * (len(word) - len(token)))
+        for symbol in self._fuzzy(self.symbol_deletes, token):
+            offer([self.by_symbol[symbol]], FUZZY_SYMBOL)
+        for word in self._fuzzy(self.word_deletes, token):
+            offer(self.words[word], FUZZY_WORD)
+        return scores
+
+    def search(self, query: str, limit: int = 10, fanout: int = 200) -> List[dict]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        total: Optional[Dict[int, float]] = None
+        for n, token in enumerate(tokens):
+            scores = self._token_scores(token, n == len(tokens) - 1, fanout)
+            # Every query word has to match something in the listing
+            total = scores if total is None else {i: total[i] + s for i, s in scores.items() if i in total}
+            if not total:
+                return []
+
+        ranked = sorted(total.items(), key=lambda item: (-item[1], len(self.listings[item[0]]["symbol"]),
+                                                         self.listings[item[0]]["symbol"]))
+        return [{**self.listings[i], "score": round(score, 2)} for i, score in ranked[:limit]]
+
+
+def load_listings(path: str) -> List[dict]:
+    """Read a listings CSV with at least symbol and name columns (exchange optional)"""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fields = {name.lower(): name for name in reader.fieldnames or []}
+        return [
+            {
+                "symbol": row[fields["symbol"]],
+                "name": row.get(fields.get("name", ""), "") or "",
+                "exchange": row.get(fields.get("exchange", ""), "") or None
+            }
+            for row in reader if row.get(fields["symbol"])
+        ]
+
+
+class SymbolSearchService:
+    """Serves search from a SymbolIndex and swaps in a fresh one whenever the universe file changes"""
+
+    def __init__(self):
+        self.path = os.getenv("SYMBOL_UNIVERSE_FILE", "data/symbols.csv")
+        self.index = SymbolIndex([])
+        self.extra: List[dict] = []
+        self._mtime: Optional[float] = None
+        self.job = PeriodicJob(
+            "symbol-universe-reload",
+            float(os.getenv("SYMBOL_UNIVERSE_POLL_SECONDS", 60)),
+            self.reload
+        )
+
+    def start(self):
+        self.job.start()
+
+    async def stop(self):
+        await self.job.stop()
+
+    async def reload(self):
+        await self.reload_if_changed()
+        await self.extend_from_stocks()
+
+    async def extend_from_stocks(self):
+        """Symbols the refresher or a quote lookup added to the stocks table since the last tick"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(models.Stock.symbol, models.Stock.name))
+            self.extend(result.all())
+
+    async def reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self._mtime is None:
+                print(f"Symbol universe file {self.path} not found, search falls back to the stocks table")
+                self._mtime = 0.0
+            return
+        if mtime == self._mtime:
+            return
+        # Parsing and indexing tens of thousands of rows is CPU work, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(None, lambda: SymbolIndex(load_listings(self.path) + self.extra))
+        self.index, self._mtime = index, mtime
+        print(f"Symbol search index rebuilt with {len(index)} listings")
+
+    def extend(self, listings: Iterable[Tuple[str, str]]):
+        """Merge in (symbol, name) pairs missing from the index, e.g. rows of the stocks table"""
+        missing = [{"symbol": symbol, "name": name or "", "exchange": None}
+                   for symbol, name in listings if symbol.upper() not in self.index.by_symbol]
+        if missing:
+            self.extra.extend(missing)
+            self.index = SymbolIndex(self.index.listings + missing)
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        return self.index.search(query, limit)
+
+symbol_search = SymbolSearchService()
@@ -0,0 +1,133 @@
+import os
+from typing import List
+from dotenv import load_dotenv
+from sqlalchemy import case, exists, func, literal, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from .. import models
+from ..database import AsyncSessionLocal
+from .scheduler import PeriodicJob
+from .symbol_search import tokenize
+
+load_dotenv()
+
+universe = models.TickerUniverse.__table__
+stocks = models.Stock.__table__
+
+# Same statements as migration b7a4c2e91d06, for databases built with create_all
+SEARCH_INDEX_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_ticker_universe_symbol_trgm ON ticker_universe USING gin (symbol gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_ticker_universe_name_trgm ON ticker_universe USING gin (name gin_trgm_ops)",
+)
+
+
+def prefix_tsquery(query: str) -> str:
+    """'apple hosp' -> 'apple & hosp:*'; tokens are alphanumeric, so nothing needs escaping"""
+    tokens = [token.lower() for token in tokenize(query)]
+    if not tokens:
+        return ""
+    return " & ".join(tokens[:-1] + [tokens[-1] + ":*"])
+
+
+class TickerUniverseService:
+    """Listings table shared by every worker, searched through pg_trgm and full-text indexes"""
+
+    def __init__(self):
+        # 3 columns per row, well under asyncpg's bind parameter limit
+        self.chunk_size = int(os.getenv("TICKER_UNIVERSE_CHUNK_SIZE", 5000))
+        # "database" for multi-worker deployments, "memory" for the per-process SymbolIndex
+        self.search_backend = os.getenv("SYMBOL_SEARCH_BACKEND", "database")
+        self.job = PeriodicJob(
+            "ticker-universe-seed",
+            float(os.getenv("TICKER_UNIVERSE_SEED_SECONDS", 60)),
+            self.seed
+        )
+
+    def start(self):
+        self.job.start()
+
+    async def stop(self):
+        await self.job.stop()
+
+    async def ensure_search_indexes(self, conn: AsyncConnection) -> bool:
+        """Install pg_trgm and the trigram indexes; without them search falls back to the memory backend"""
+        try:
+            async with conn.begin_nested():
+                for statement in SEARCH_INDEX_DDL:
+                    await conn.execute(text(statement))
+        except Exception as e:
+            print(f"pg_trgm search indexes unavailable ({e}), falling back to in-memory symbol search")
+            self.search_backend = "memory"
+            return False
+        return True
+
+    async def seed_from_stocks(self, db: AsyncSession) -> int:
+        """Add stocks rows missing from the universe, so known tickers stay searchable before any listings load"""
+        stmt = pg_insert(universe).from_select(
+            ["symbol", "name"],
+            select(stocks.c.symbol, func.coalesce(stocks.c.name, "")).where(
+                ~exists().where(universe.c.symbol == stocks.c.symbol)
+            )
+        )
+        result = await db.execute(stmt.on_conflict_do_nothing(index_elements=[universe.c.symbol]))
+        await db.commit()
+        return result.rowcount
+
+    async def seed(self):
+        async with AsyncSessionLocal() as db:
+            await self.seed_from_stocks(db)
+
+    async def bulk_load(self, db: AsyncSession, listings: List[dict]) -> int:
+        """Multi-row INSERT .. ON CONFLICT (symbol) per chunk, so reloading a file is idempotent"""
+        rows = {}
+        for listing in listings:
+            symbol = listing["symbol"].strip().upper()
+            if symbol:
+                rows[symbol] = {"symbol": symbol, "name": listing.get("name") or "",
+                                "exchange": listing.get("exchange")}
+        rows = list(rows.values())
+
+        for start in range(0, len(rows), self.chunk_size):
+            stmt = pg_insert(universe).values(rows[start:start + self.chunk_size])
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[universe.c.symbol],
+                set_={"name": stmt.excluded.name, "exchange": stmt.excluded.exchange, "updated_at": func.now()}
+            ))
+        await db.commit()
+        return len(rows)
+
+    def search_query(self, query: str, limit: int = 10):
+        """Ranked search: exact/prefix symbol first, then trigram and full-text similarity on the name
+
+        Every branch of the WHERE clause is answerable from a GIN index
+        (LIKE and % / <% via gin_trgm_ops, @@ via the tsvector index).
+        """
+        symbol_query = query.strip().upper()
+        tsquery = func.to_tsquery("simple", prefix_tsquery(query))
+        score = (
+            case((universe.c.symbol == symbol_query, 3.0), else_=0.0)
+            + case((universe.c.symbol.startswith(symbol_query, autoescape=True), 1.0), else_=0.0)
+            + func.similarity(universe.c.symbol, symbol_query)
+            + func.word_similarity(query, universe.c.name)
+            + func.ts_rank(universe.c.name_tsv, tsquery)
+        )
+        return select(
+            universe.c.symbol, universe.c.name, universe.c.exchange, score.label("score")
+        ).where(or_(
+            universe.c.symbol.startswith(symbol_query, autoescape=True),
+            universe.c.symbol.op("%")(symbol_query),
+            literal(query).op("<%")(universe.c.name),
+            universe.c.name_tsv.op("@@")(tsquery)
+        )).order_by(score.desc(), func.length(universe.c.symbol), universe.c.symbol).limit(limit)
+
+    async def search(self, db: AsyncSession, query: str, limit: int = 10) -> List[dict]:
+        if not prefix_tsquery(query):
+            return []
+        result = await db.execute(self.search_query(query, limit))
+        return [
+            {"symbol": row.symbol, "name": row.name, "exchange": row.exchange, "score": round(row.score, 3)}
+            for row in result.all()
+        ]
+
+ticker_universe = TickerUniverseService()
@@ -0,0 +1,276 @@
+import os
+from typing import List
+from sqlalchemy import delete, exists, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from .leaderboard_service import leaderboard_service
+
+users = models.User.__table__
+stocks = models.Stock.__table__
+portfolio = models.Portfolio.__table__
+transactions = models.Transaction.__table__
+
+BATCH_MODES = ("all_or_nothing", "best_effort")
+MAX_BATCH_ORDERS = int(os.getenv("TRADE_BATCH_MAX_ORDERS", 500))
+
+
+class TradeError(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class TradeEngine:
+    """Executes market orders as a single transaction of conditional updates
+
+    The balance and share checks live in the WHERE clause of the UPDATE that
+    applies them, so concurrent orders from one user serialize on the row lock
+    and can never both pass a check. Locks are always taken users -> portfolio
+    to keep buys and sells from deadlocking each other.
+    """
+
+    def _price(self, symbol: str):
+        return select(stocks.c.current_price).where(stocks.c.symbol == symbol).scalar_subquery()
+
+    async def _stock_exists(self, db: AsyncSession, symbol: str) -> bool:
+        result = await db.execute(select(exists().where(stocks.c.symbol == symbol)))
+        return result.scalar()
+
+    async def _buy(self, db: AsyncSession, user_id: int, symbol: str, quantity: int) -> float:
+        price = self._price(symbol)
+        result = await db.execute(
+            update(users).where(
+                users.c.id == user_id,
+                users.c.balance >= price * quantity
+            ).values(balance=users.c.balance - price * quantity).returning(price.label("price"))
+        )
+        row = result.first()
+        if row is None:
+            await db.rollback()
+            if not await self._stock_exists(db, symbol):
+                raise TradeError("Stock not found", status_code=404)
+            raise TradeError("Insufficient balance")
+        current_price = row.price
+
+        stmt = pg_insert(portfolio).values(
+            user_id=user_id,
+            symbol=symbol,
+            quantity=quantity,
+            avg_price=current_price,
+            current_price=current_price,
+            valued_at=func.now()
+        )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[portfolio.c.user_id, portfolio.c.symbol],
+            set_={
+                "avg_price": (portfolio.c.avg_price * portfolio.c.quantity + stmt.excluded.avg_price * stmt.excluded.quantity)
+                / (portfolio.c.quantity + stmt.excluded.quantity),
+                "quantity": portfolio.c.quantity + stmt.excluded.quantity,
+                "current_price": stmt.excluded.current_price,
+                "valued_at": stmt.excluded.valued_at,
+                "updated_at": func.now()
+            }
+        ))
+        return current_price
+
+    async def _sell(self, db: AsyncSession, user_id: int, symbol: str, quantity: int) -> float:
+        price = self._price(symbol)
+        # Credit first so the user row is locked before the holding, same order as buys
+        result = await db.execute(
+            update(users).where(
+                users.c.id == user_id,
+                price.is_not(None)
+            ).values(balance=users.c.balance + price * quantity).returning(price.label("price"))
+        )
+        row = result.first()
+        if row is None:
+            await db.rollback()
+            raise TradeError("Stock not found", status_code=404)
+        current_price = row.price
+
+        result = await db.execute(
+            update(portfolio).where(
+                portfolio.c.user_id == user_id,
+                portfolio.c.symbol == symbol,
+                portfolio.c.quantity >= quantity
+            ).values(
+                quantity=portfolio.c.quantity - quantity,
+                current_price=current_price,
+                valued_at=func.now(),
+                updated_at=func.now()
+            ).returning(portfolio.c.quantity)
+        )
+        remaining = result.scalar_one_or_none()
+        if remaining is None:
+            await db.rollback()
+            raise TradeError("Insufficient shares")
+
+        if remaining == 0:
+            await db.execute(delete(portfolio).where(
+                portfolio.c.user_id == user_id,
+                portfolio.c.symbol == symbol,
+                portfolio.c.quantity == 0
+            ))
+        return current_price
+
+    async def execute(self, db: AsyncSession, user_id: int, symbol: str, side: str, quantity: int) -> dict:
+        symbol = symbol.upper()
+        if quantity <= 0:
+            raise TradeError("Quantity must be positive")
+
+        if side == "buy":
+            current_price = await self._buy(db, user_id, symbol, quantity)
+        elif side == "sell":
+            current_price = await self._sell(db, user_id, symbol, quantity)
+        else:
+            raise TradeError("Invalid trade type")
+
+        result = await db.execute(
+            insert(transactions).values(
+                user_id=user_id,
+                symbol=symbol,
+                type=side,
+                quantity=quantity,
+                price=current_price,
+                total=current_price * quantity
+            ).returning(*transactions.c)
+        )
+        transaction = dict(result.one()._mapping)
+
+        # Standings change in the same transaction as the trade
+        await leaderboard_service.refresh_users(db, [user_id], commit=False)
+        await db.commit()
+        return transaction
+
+    async def execute_batch(self, db: AsyncSession, user_id: int, orders: List[dict],
+                            mode: str = "all_or_nothing") -> dict:
+        """Validate and execute a list of orders for one user in a single transaction
+
+        Prices and holdings are loaded with one query each, orders are applied in
+        sequence against that snapshot in memory, and the outcome is written back
+        with one statement per table.
+        """
+        if mode not in BATCH_MODES:
+            raise TradeError(f"Invalid batch mode, expected one of {', '.join(BATCH_MODES)}")
+        if not orders:
+            raise TradeError("Batch contains no orders")
+        if len(orders) > MAX_BATCH_ORDERS:
+            raise TradeError(f"Batch exceeds {MAX_BATCH_ORDERS} orders")
+
+        symbols = sorted({order["symbol"].upper() for order in orders})
+
+        # Lock the user first, the same order single trades take their locks in
+        result = await db.execute(select(users.c.balance).where(users.c.id == user_id).with_for_update())
+        balance = result.scalar_one()
+        result = await db.execute(
+            select(stocks.c.symbol, stocks.c.current_price).where(stocks.c.symbol.in_(symbols))
+        )
+        prices = {symbol: price for symbol, price in result.all() if price is not None}
+        result = await db.execute(
+            select(portfolio.c.symbol, portfolio.c.quantity, portfolio.c.avg_price).where(
+                portfolio.c.user_id == user_id,
+                portfolio.c.symbol.in_(symbols)
+            ).with_for_update()
+        )
+        holdings = {symbol: [quantity, avg_price] for symbol, quantity, avg_price in result.all()}
+
+        results = []
+        executed = []
+        touched = set()
+        for index, order in enumerate(orders):
+            symbol = order["symbol"].upper()
+            side = order["type"]
+            quantity = order["quantity"]
+            outcome = {"index": index, "symbol": symbol, "type": side, "quantity": quantity}
+            results.append(outcome)
+
+            error = None
+            price = prices.get(symbol)
+            holding = holdings.get(symbol)
+            if side not in ("buy", "sell"):
+                error = "Invalid trade type"
+            elif quantity <= 0:
+                error = "Quantity must be positive"
+            elif price is None:
+                error = "Stock not found"
+            elif side == "buy" and balance < price * quantity:
+                error = "Insufficient balance"
+            elif side == "sell" and (not holding or holding[0] < quantity):
+                error = "Insufficient shares"
+            if error:
+                outcome.update(status="rejected", error=error)
+                continue
+
+            total = price * quantity
+            if side == "buy":
+                balance -= total
+                if holding:
+                    holding[1] = (holding[1] * holding[0] + total) / (holding[0] + quantity)
+                    holding[0] += quantity
+                else:
+                    holdings[symbol] = [quantity, price]
+            else:
+                balance += total
+                holding[0] -= quantity
+            touched.add(symbol)
+            outcome.update(status="executed", price=price, total=total)
+            executed.append(outcome)
+
+        rejected = len(results) - len(executed)
+        if mode == "all_or_nothing" and rejected:
+            await db.rollback()
+            for outcome in executed:
+                outcome.update(status="cancelled", price=None, total=None,
+                               error="Batch rolled back because another order was rejected")
+            result = await db.execute(select(users.c.balance).where(users.c.id == user_id))
+            return {"mode": mode, "executed": 0, "rejected": rejected,
+                    "balance": result.scalar_one(), "results": results}
+
+        if executed:
+            await db.execute(update(users).where(users.c.id == user_id).values(balance=balance))
+
+            kept = [
+                {"user_id": user_id, "symbol": symbol, "quantity": holdings[symbol][0],
+                 "avg_price": holdings[symbol][1], "current_price": prices[symbol], "valued_at": func.now()}
+                for symbol in sorted(touched) if holdings[symbol][0] > 0
+            ]
+            emptied = [symbol for symbol in sorted(touched) if holdings[symbol][0] == 0]
+            if kept:
+                stmt = pg_insert(portfolio).values(kept)
+                # Rows are locked above, so writing the final quantities back is safe
+                await db.execute(stmt.on_conflict_do_update(
+                    index_elements=[portfolio.c.user_id, portfolio.c.symbol],
+                    set_={
+                        "quantity": stmt.excluded.quantity,
+                        "avg_price": stmt.excluded.avg_price,
+                        "current_price": stmt.excluded.current_price,
+                        "valued_at": func.now(),
+                        "updated_at": func.now()
+                    }
+                ))
+            if emptied:
+                await db.execute(delete(portfolio).where(
+                    portfolio.c.user_id == user_id,
+                    portfolio.c.symbol.in_(emptied)
+                ))
+
+            result = await db.execute(
+                insert(transactions).returning(transactions.c.id, sort_by_parameter_order=True),
+                [
+                    {"user_id": user_id, "symbol": outcome["symbol"], "type": outcome["type"],
+                     "quantity": outcome["quantity"], "price": outcome["price"], "total": outcome["total"]}
+                    for outcome in executed
+                ]
+            )
+            for outcome, transaction_id in zip(executed, result.scalars().all()):
+                outcome["transaction_id"] = transaction_id
+
+            await leaderboard_service.refresh_users(db, [user_id], commit=False)
+        await db.commit()
+
+        return {"mode": mode, "executed": len(executed), "rejected": rejected,
+                "balance": balance, "results": results}
+
+trade_engine = TradeEngine()
@@ -0,0 +1,95 @@
+"""Load-test the LLM scheduler against the fake model backend (no network).
+
+Fires interactive requests at a steady rate plus periodic bursts of background
+requests, then reports latency per priority and the scheduler's counters.
+
+Usage:
+    python benchmarks/llm_scheduler.py --duration 30 --interactive-rps 2 --rpm 60 --failure-rate 0.05
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.blocking import BlockingGateway
+from app.services.llm_scheduler import (
+    BACKGROUND, INTERACTIVE, PRIORITY_NAMES, FakeModel, LLMScheduler, LLMSchedulerError, TokenBucket
+)
+
+
+async def run(args):
+    gateway = BlockingGateway("fake-llm", max_concurrency=args.concurrency, timeout=args.timeout)
+    scheduler = LLMScheduler(gateway)
+    scheduler.bucket = TokenBucket(args.rpm, args.burst)
+    scheduler.max_queue = args.max_queue
+    scheduler.max_concurrency = args.concurrency
+    scheduler.daily_budget = args.budget
+    model = FakeModel(args.latency_ms, args.jitter_ms, args.failure_rate, args.quota_rate, seed=args.seed)
+    scheduler.configure(model.generate_content)
+
+    latencies = defaultdict(list)
+    outcomes = defaultdict(lambda: defaultdict(int))
+
+    async def one(priority, n):
+        started = time.perf_counter()
+        try:
+            await scheduler.submit(f"Explain the financial term 'term {n}'", priority=priority)
+            outcomes[priority]["ok"] += 1
+            latencies[priority].append(time.perf_counter() - started)
+        except LLMSchedulerError as e:
+            outcomes[priority][type(e).__name__] += 1
+        except Exception:
+            outcomes[priority]["model_error"] += 1
+
+    tasks = []
+    started = time.monotonic()
+    n = 0
+    next_burst = started
+    while time.monotonic() - started < args.duration:
+        if time.monotonic() >= next_burst:
+            tasks.extend(asyncio.create_task(one(BACKGROUND, n + i)) for i in range(args.burst_size))
+            next_burst += args.burst_every
+        tasks.append(asyncio.create_task(one(INTERACTIVE, n)))
+        n += 1
+        await asyncio.sleep(1 / args.interactive_rps)
+    await asyncio.gather(*tasks)
+    gateway.shutdown()
+
+    print(f"{len(tasks)} requests over {args.duration}s, budget {args.rpm} rpm (burst {args.burst}), "
+          f"{model.calls} model calls")
+    for priority, name in PRIORITY_NAMES.items():
+        samples = sorted(latencies[priority])
+        p50 = statistics.median(samples) if samples else 0.0
+        p95 = samples[int(len(samples) * 0.95) - 1] if samples else 0.0
+        print(f"  {name:<12} p50 {p50:6.2f}s  p95 {p95:6.2f}s  outcomes {dict(outcomes[priority])}")
+    print("Scheduler:", scheduler.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--interactive-rps", type=float, default=2)
+    parser.add_argument("--burst-size", type=int, default=20, help="Background requests per burst")
+    parser.add_argument("--burst-every", type=float, default=10)
+    parser.add_argument("--rpm", type=float, default=60)
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--max-queue", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--budget", type=int, default=100000)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--quota-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
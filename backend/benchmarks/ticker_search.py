@@ -0,0 +1,106 @@
+"""Benchmark ticker_universe search: ranked trigram/full-text query vs ILIKE '%q%'.
+
+Copies the ticker_universe definition (indexes and generated tsvector included)
+into a temporary table, fills it with synthetic listings, and times both query
+shapes over the same set of search terms. Needs DATABASE_URL and pg_trgm.
+
+Usage:
+    python benchmarks/ticker_search.py --rows 50000 --queries 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import or_, select, table, column, text
+
+from app.database import engine
+from app.services.ticker_universe import ticker_universe
+
+WORDS = ["global", "capital", "energy", "health", "systems", "bank", "holdings", "pharma", "tech",
+         "resources", "motors", "foods", "airlines", "realty", "mining", "software", "retail", "media"]
+
+
+def synthetic_listings(rows: int, rng: random.Random):
+    seen = set()
+    while len(seen) < rows:
+        symbol = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(1, 5)))
+        if symbol in seen:
+            continue
+        seen.add(symbol)
+        name = " ".join([rng.choice(string.ascii_uppercase) + "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))),
+                         *rng.sample(WORDS, 2), "Inc"])
+        yield {"symbol": symbol, "name": name, "exchange": rng.choice(["NYSE", "NASDAQ", "AMEX"])}
+
+
+def percentile(samples, q):
+    return sorted(samples)[min(int(len(samples) * q), len(samples) - 1)]
+
+
+async def timed(conn, statement, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await conn.execute(statement)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    listings = list(synthetic_listings(args.rows, rng))
+    terms = [rng.choice(listings)["symbol"][:rng.randint(1, 3)] for _ in range(args.queries // 2)]
+    terms += [rng.choice(listings)["name"].split()[rng.randint(0, 2)][:rng.randint(4, 7)] for _ in range(args.queries // 2)]
+
+    async with engine.connect() as conn:
+        await conn.execute(text("CREATE TEMP TABLE ticker_universe_bench (LIKE ticker_universe INCLUDING ALL)"))
+        for start in range(0, len(listings), 5000):
+            await conn.execute(
+                text("INSERT INTO ticker_universe_bench (symbol, name, exchange) VALUES (:symbol, :name, :exchange)"),
+                listings[start:start + 5000]
+            )
+        await conn.execute(text("ANALYZE ticker_universe_bench"))
+
+        bench = table("ticker_universe_bench", column("symbol"), column("name"))
+        ilike_samples, ranked_samples = [], []
+        for term in terms:
+            ilike = select(bench.c.symbol, bench.c.name).where(or_(
+                bench.c.symbol.ilike(f"%{term}%"), bench.c.name.ilike(f"%{term}%")
+            )).limit(10)
+            ilike_samples += await timed(conn, ilike, args.repeat)
+            ranked = text(str(ticker_universe.search_query(term).compile(
+                engine.sync_engine, compile_kwargs={"literal_binds": True}
+            )).replace("ticker_universe", "ticker_universe_bench"))
+            ranked_samples += await timed(conn, ranked, args.repeat)
+
+        plan = await conn.execute(text("EXPLAIN " + str(ticker_universe.search_query("capit").compile(
+            engine.sync_engine, compile_kwargs={"literal_binds": True}
+        )).replace("ticker_universe", "ticker_universe_bench")))
+        await conn.rollback()
+
+    print(f"{args.rows:,} listings, {len(terms)} terms x {args.repeat} runs")
+    for label, samples in (("ILIKE '%q%'", ilike_samples), ("ranked trigram/fts", ranked_samples)):
+        print(f"  {label:<20} p50 {statistics.median(samples):7.2f} ms   p95 {percentile(samples, 0.95):7.2f} ms")
+    print("Ranked query plan:")
+    for (line,) in plan.all():
+        print("  " + line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
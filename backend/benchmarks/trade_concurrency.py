@@ -0,0 +1,116 @@
+"""Concurrency benchmark for the trade engine.
+
+Fires many concurrent market orders for one user against a real database
+(DATABASE_URL) and checks that balance, holding and transaction log agree
+afterwards, i.e. no order was lost or double-spent.
+
+Usage:
+    python benchmarks/trade_concurrency.py --workers 32 --orders 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, select
+from app import models
+from app.database import AsyncSessionLocal, engine
+from app.main import create_tables
+from app.services.trade_engine import TradeError, trade_engine
+
+PRICE = 10.0
+
+
+async def setup(budget_shares: int):
+    # Same schema setup as app startup, so model changes don't need mirroring here
+    await create_tables()
+    symbol = f"BX{uuid.uuid4().hex[:6].upper()}"
+    async with AsyncSessionLocal() as db:
+        db.add(models.Stock(symbol=symbol, name="Benchmark", current_price=PRICE, change=0,
+                            change_percent=0, volume=0))
+        user = models.User(username=f"bench-{symbol}", email=f"{symbol.lower()}@bench.local",
+                           hashed_password="x", balance=budget_shares * PRICE)
+        db.add(user)
+        await db.commit()
+        return user.id, symbol, user.balance
+
+
+async def worker(user_id: int, symbol: str, orders: int, sell_ratio: float, stats: dict):
+    rng = random.Random()
+    for _ in range(orders):
+        side = "sell" if rng.random() < sell_ratio else "buy"
+        async with AsyncSessionLocal() as db:
+            try:
+                await trade_engine.execute(db, user_id, symbol, side, 1)
+                stats[side] += 1
+            except TradeError:
+                stats["rejected"] += 1
+
+
+async def verify(user_id: int, symbol: str, initial_balance: float, stats: dict) -> bool:
+    async with AsyncSessionLocal() as db:
+        balance = (await db.execute(select(models.User.balance).where(models.User.id == user_id))).scalar()
+        held = (await db.execute(select(func.coalesce(func.sum(models.Portfolio.quantity), 0)).where(
+            models.Portfolio.user_id == user_id, models.Portfolio.symbol == symbol))).scalar()
+        logged = (await db.execute(select(func.count()).select_from(models.Transaction).where(
+            models.Transaction.user_id == user_id))).scalar()
+
+    expected_balance = initial_balance - (stats["buy"] - stats["sell"]) * PRICE
+    checks = {
+        "balance matches executed orders": abs(balance - expected_balance) < 1e-6,
+        "holding matches executed orders": held == stats["buy"] - stats["sell"],
+        "every executed order is logged": logged == stats["buy"] + stats["sell"],
+        "balance never negative": balance >= 0
+    }
+    for name, ok in checks.items():
+        print(f"  [{'ok' if ok else 'FAIL'}] {name}")
+    return all(checks.values())
+
+
+async def cleanup(user_id: int, symbol: str):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(models.Transaction).where(models.Transaction.user_id == user_id))
+        await db.execute(delete(models.Portfolio).where(models.Portfolio.user_id == user_id))
+        await db.execute(delete(models.LeaderboardEntry).where(models.LeaderboardEntry.user_id == user_id))
+        await db.execute(delete(models.User).where(models.User.id == user_id))
+        await db.execute(delete(models.Stock).where(models.Stock.symbol == symbol))
+        await db.commit()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--orders", type=int, default=50, help="Orders per worker")
+    parser.add_argument("--budget", type=int, default=1000,
+                        help="Shares the user can afford; keep it below workers*orders to exercise rejections")
+    parser.add_argument("--sell-ratio", type=float, default=0.3)
+    args = parser.parse_args()
+
+    user_id, symbol, initial_balance = await setup(args.budget)
+    stats = {"buy": 0, "sell": 0, "rejected": 0}
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker(user_id, symbol, args.orders, args.sell_ratio, stats) for _ in range(args.workers)
+        ))
+        elapsed = time.perf_counter() - started
+
+        attempted = args.workers * args.orders
+        print(f"{attempted} orders from {args.workers} concurrent workers in {elapsed:.2f}s")
+        print(f"  executed: {stats['buy']} buys, {stats['sell']} sells, rejected: {stats['rejected']}")
+        print(f"  throughput: {attempted / elapsed:.1f} orders/s, "
+              f"{(stats['buy'] + stats['sell']) / elapsed:.1f} trades/s")
+        ok = await verify(user_id, symbol, initial_balance, stats)
+    finally:
+        await cleanup(user_id, symbol)
+        await engine.dispose()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
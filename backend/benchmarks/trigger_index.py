@@ -0,0 +1,83 @@
+"""Benchmark the resting-order TriggerIndex with a large book.
+
+Loads N resting limit/stop orders spread over a symbol universe, then replays
+random-walk price ticks and compares the heap index against a naive scan of
+every open order.
+
+Usage:
+    python benchmarks/trigger_index.py --orders 1000000 --symbols 5000 --ticks 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.order_engine import FALLS_TO, RISES_TO, TriggerIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--ticks", type=int, default=200, help="Refresh ticks to replay")
+    parser.add_argument("--scan-ticks", type=int, default=5, help="Ticks to time with the naive scan")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f"S{i:05d}" for i in range(args.symbols)]
+    prices = {symbol: 100.0 for symbol in symbols}
+
+    orders = []
+    for order_id in range(1, args.orders + 1):
+        symbol = rng.choice(symbols)
+        direction = rng.choice((FALLS_TO, RISES_TO))
+        offset = rng.uniform(0.01, 0.25)
+        threshold = 100.0 * (1 - offset if direction == FALLS_TO else 1 + offset)
+        orders.append((order_id, symbol, direction, threshold))
+
+    started = time.perf_counter()
+    index = TriggerIndex()
+    for order in orders:
+        index.add(*order)
+    build = time.perf_counter() - started
+    print(f"Indexed {len(index):,} resting orders over {args.symbols:,} symbols in {build:.2f}s")
+
+    # Naive baseline: check every open order of every ticked symbol
+    open_orders = {order[0]: order for order in orders}
+    scan_times = []
+    for _ in range(args.scan_ticks):
+        ticked = {symbol: prices[symbol] * (1 + rng.gauss(0, 0.01)) for symbol in rng.sample(symbols, len(symbols) // 2)}
+        started = time.perf_counter()
+        fired = [
+            order_id for order_id, symbol, direction, threshold in open_orders.values()
+            if symbol in ticked and (
+                ticked[symbol] <= threshold if direction == FALLS_TO else ticked[symbol] >= threshold
+            )
+        ]
+        scan_times.append(time.perf_counter() - started)
+    print(f"Naive scan: {sum(scan_times) / len(scan_times) * 1000:.1f} ms/tick")
+
+    tick_times = []
+    total_fired = 0
+    for _ in range(args.ticks):
+        changed = rng.sample(symbols, len(symbols) // 2)
+        for symbol in changed:
+            prices[symbol] *= 1 + rng.gauss(0, 0.01)
+        started = time.perf_counter()
+        for symbol in changed:
+            total_fired += len(index.crossed(symbol, prices[symbol]))
+        tick_times.append(time.perf_counter() - started)
+
+    tick_times.sort()
+    print(f"Trigger index over {args.ticks} ticks ({len(symbols) // 2:,} changed symbols each):")
+    print(f"  mean {sum(tick_times) / len(tick_times) * 1000:.2f} ms/tick, "
+          f"p99 {tick_times[int(len(tick_times) * 0.99) - 1] * 1000:.2f} ms/tick")
+    print(f"  fired {total_fired:,} orders, {len(index):,} still resting")
+
+
+if __name__ == "__main__":
+    main()
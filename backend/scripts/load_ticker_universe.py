@@ -0,0 +1,33 @@
+"""Bulk-load a listings CSV (symbol,name[,exchange]) into the ticker_universe table.
+
+Usage:
+    python scripts/load_ticker_universe.py data/symbols.csv
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import AsyncSessionLocal
+from app.services.symbol_search import load_listings
+from app.services.ticker_universe import ticker_universe
+
+
+async def load(path: str):
+    listings = load_listings(path)
+    async with AsyncSessionLocal() as db:
+        written = await ticker_universe.bulk_load(db, listings)
+    print(f"Loaded {written} listings from {path} into ticker_universe")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", nargs="?", default=os.getenv("SYMBOL_UNIVERSE_FILE", "data/symbols.csv"))
+    args = parser.parse_args()
+    asyncio.run(load(args.path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Record yfinance data into a directory that MARKET_DATA_PROVIDER=replay can serve.
+
+Usage:
+    python scripts/record_market_data.py --dir market_data --period 1y AAPL MSFT NVDA
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.market_data import RecordingProvider, YFinanceProvider
+from app.services.stock_service import stock_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("symbols", nargs="*", help="Symbols to record (defaults to the built-in universe)")
+    parser.add_argument("--dir", default=os.getenv("MARKET_DATA_DIR", "market_data"))
+    parser.add_argument("--period", default="1y")
+    parser.add_argument("--interval", default="1d")
+    args = parser.parse_args()
+
+    symbols = [symbol.upper() for symbol in args.symbols] or stock_service.default_stocks
+    recorder = RecordingProvider(YFinanceProvider(), args.dir)
+    recorder.download_history(symbols, period=args.period, interval=args.interval)
+    for symbol in symbols:
+        recorder.get_info(symbol)
+    print(f"Recorded {len(symbols)} symbols into {args.dir}")
+
+
+if __name__ == "__main__":
+    main()